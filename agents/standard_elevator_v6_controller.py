@@ -1,46 +1,33 @@
 import numpy as np
 
+from envs.encoders import view_observation
+
 
 class StandardElevatorV6Controller:
     def __init__(self, env):
         self.env = env
 
     def predict(self, obs: np.array, deterministic=True):
-        obs = obs.astype(np.int32)
-        elevators = [{} for _ in range(self.env.num_elevators)]
-        i = 2
-        for elev in elevators:
-            elev['floor'] = obs[i]
-            elev['target'] = obs[i+1]
-            elev['time_to_next_floor'] = obs[i+2]
-            elev['prev_direction'] = obs[i+3]
-            elev['direction'] = obs[i+4]
-            i += 5
-            floor_requests = []
-            for k in range(self.env.num_floors):
-                floor_requests.append(obs[i+k])
-            i += self.env.num_floors_end
-            elev['requests'] = floor_requests
-
-        up_pressed = []
-        down_pressed = []
-        for k in range(self.env.num_floors):
-            up_pressed.append(obs[i+k])
-        i += self.env.num_floors_end
-        for k in range(self.env.num_floors):
-            down_pressed.append(obs[i+k])
+        obs = view_observation(obs, self.env.observation_layout)
+        elevators = obs["elevators"][: self.env.num_elevators]
+        floors = elevators["floor"].tolist()
+        directions = elevators["direction"].tolist()
+        prev_directions = elevators["prev_direction"].tolist()
+        requests = elevators["buttons"].tolist()
+        up_pressed = obs["up"].tolist()
+        down_pressed = obs["down"].tolist()
 
         # actual algo
 
         # action = np.zeros(self.env.num_floors_end * self.env.num_elevators_end)
         action = np.zeros(self.env.num_elevators_end)
 
-        for elev_id, elev in enumerate(elevators):
+        for elev_id, elev_floor in enumerate(floors):
             all_stops_down = set()
             all_stops_up = set()
             for i in range(self.env.num_floors):
-                if elev['requests'][i] == 1:
-                    if i > elev['floor']:
+                if requests[elev_id][i] == 1:
+                    if i > elev_floor:
                         all_stops_up.add(i)
                     else:
                         all_stops_down.add(i)
@@ -51,18 +38,18 @@ class StandardElevatorV6Controller:
 
             selected_action = None
 
-            down_floors_below = [floor for floor in all_stops_down if floor < elev['floor']]
-            down_floors_above = [floor for floor in all_stops_down if floor > elev['floor']]
-            up_floors_below = [floor for floor in all_stops_up if floor < elev['floor']]
-            up_floors_above = [floor for floor in all_stops_down if floor > elev['floor']]
+            down_floors_below = [floor for floor in all_stops_down if floor < elev_floor]
+            down_floors_above = [floor for floor in all_stops_down if floor > elev_floor]
+            up_floors_below = [floor for floor in all_stops_up if floor < elev_floor]
+            up_floors_above = [floor for floor in all_stops_down if floor > elev_floor]
 
-            if elev['direction'] == 0 and len(down_floors_below) > 0:
+            if directions[elev_id] == 0 and len(down_floors_below) > 0:
                 # already moving down, select next closest floor that's below
                 selected_action = max(down_floors_below)
-            elif elev['direction'] == 2 and len(up_floors_above) > 0:
+            elif directions[elev_id] == 2 and len(up_floors_above) > 0:
                 selected_action = min(up_floors_above)
             else:
-                if elev['prev_direction'] == 0:
+                if prev_directions[elev_id] == 0:
                     # was moving down before, check below first
                     if len(down_floors_below) > 0:
                         selected_action = max(down_floors_below)
@@ -73,7 +60,7 @@ class StandardElevatorV6Controller:
                     elif len(down_floors_above) > 0:
                         selected_action = max(down_floors_above)
                     else:
-                        selected_action = elev['floor']
+                        selected_action = elev_floor
                 else:
                     # was moving up before, check above first
                     if len(up_floors_above) > 0:
@@ -85,7 +72,7 @@ class StandardElevatorV6Controller:
                     elif len(up_floors_below) > 0:
                         selected_action = min(up_floors_below)
                     else:
-                        selected_action = elev['floor']
+                        selected_action = elev_floor
 
             # action[elev_id * self.env.num_floors_end + selected_action] = 1
             action[elev_id] = selected_action
@@ -2,7 +2,10 @@ import argparse
 
 from elevator_animation import ElevatorAnimation
 from agents.standard_elevator_v7_controller import StandardElevatorV7Controller
+from envs.decision_points import DecisionPointWrapper
 from envs.elevator_v7 import ElevatorV7Env
+from envs.traces import TraceArrivals
+from envs.traffic_profiles import ProfileArrivals, TrafficProfile
 from stable_baselines3 import PPO
 from tqdm import tqdm
 from multiprocessing import Process
@@ -12,31 +15,45 @@ import numpy as np
 import random
 
 
-def benchmark_agent(model_filepath, num_episodes=100, num_elevators_start=1, num_elevators_end=1, num_floors_start=3, num_floors_end=3, animation_delay=-1):
+def benchmark_agent(model_filepath, num_episodes=100, num_elevators_start=1, num_elevators_end=1, num_floors_start=3, num_floors_end=3, animation_delay=-1, traffic_profile=None, trace=None, decision_points=False):
     RANDOM_SEED = 456
     torch.manual_seed(RANDOM_SEED)
     np.random.seed(RANDOM_SEED)
     random.seed(RANDOM_SEED)
 
+    # uniform arrivals by default, a trace is replayed from its start (the same calls for every model),
+    # with a profile episodes start at random times of day
+    arrivals = None
+    if trace is not None:
+        arrivals = TraceArrivals(trace)
+    elif traffic_profile is not None:
+        arrivals = ProfileArrivals(TrafficProfile.load(traffic_profile), start_step=None)
+
     env = ElevatorV7Env(curriculum=True,
                         num_elevators_start=num_elevators_start,
                         num_elevators_end=num_elevators_end,
                         num_floors_start=num_floors_start,
                         num_floors_end=num_floors_end,
                         episode_len=100,
-                        random_seed=RANDOM_SEED)
+                        random_seed=RANDOM_SEED,
+                        arrivals=arrivals)
 
     if model_filepath == "Standard Controller":
         model = StandardElevatorV7Controller(env)
     else:
         model = PPO.load(model_filepath, env=env)
 
+    if decision_points:
+        # only query the model when an elevator reaches a floor or a request appears
+        env = DecisionPointWrapper(env)
+
     print(f"Benchmarking {model_filepath}")
 
     if animation_delay >= 0:
         animation = ElevatorAnimation(env, title=model_filepath, delay=animation_delay, padding=150, width=1000)
 
     all_rewards = []
+    num_decisions = 0
     for _ in tqdm(range(num_episodes)):
         obs = env.reset(override_curriculum=True)
         done = False
@@ -44,20 +61,21 @@ def benchmark_agent(model_filepath, num_episodes=100, num_elevators_start=1, num
         while not done:
             # elevator animation
             if animation_delay >= 0:
-                animation.set_environment(env)
+                animation.set_environment(env.unwrapped)
                 animation.draw_environment()
 
             # get action and update environment
             action, _ = model.predict(obs, deterministic=True)
-            obs, reward, done, _ = env.step(action)
-            reward_sum += reward
+            obs, reward, done, info = env.step(action)
+            reward_sum += info["reward_sum"] if decision_points else reward
+            num_decisions += 1
         all_rewards.append(reward_sum)
 
     all_rewards = np.array(all_rewards)
     mean = np.mean(all_rewards)
     std = np.std(all_rewards)
 
-    print(f"{model_filepath}: {mean=}, {std=}")
+    print(f"{model_filepath}: {mean=}, {std=}, {num_decisions} decisions")
 
 
 def main(args):
@@ -70,7 +88,10 @@ def main(args):
         'num_elevators_end': 1,
         'num_floors_start': num_floors,
         'num_floors_end': num_floors,
-        'animation_delay': float(args.animation_delay)
+        'animation_delay': float(args.animation_delay),
+        'traffic_profile': args.traffic_profile,
+        'trace': args.trace,
+        'decision_points': bool(int(args.decision_points))
     }
 
     procs = []
@@ -89,5 +110,8 @@ if __name__ == '__main__':
     parser.add_argument('--num_floors', '-n', default=3, help='number of floors for environment')
     parser.add_argument('--models', '-m', nargs='+', help='Paths to models to be evaluated', required=True)
     parser.add_argument('--animation_delay', '-a', default=-1, help='Animation delay (in seconds) between timesteps, animation off by default')
+    parser.add_argument('--traffic_profile', '-p', default=None, help='Path to a TrafficProfile (.npz) to use instead of uniform arrivals')
+    parser.add_argument('--trace', default=None, help='Path to a hall call trace (see convert_call_logs.py) to replay instead of uniform arrivals')
+    parser.add_argument('--decision_points', '-d', default=0, help='Only query the models at decision points: an elevator reaching a floor or a new request (0 or 1)')
     args = parser.parse_args()
     main(args)
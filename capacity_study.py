@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from agents.standard_elevator_v7_controller import StandardElevatorV7Controller
+from envs.elevator_event_sim import ElevatorEventSim
+from envs.traffic_profiles import ProfileArrivals, TrafficProfile
+
+
+def main(args):
+    num_floors = int(args.num_floors)
+    num_elevators = int(args.num_elevators)
+    num_days = float(args.days)
+
+    # one timestep per second, office traffic profile repeated every day
+    if args.traffic_profile is not None:
+        profile = TrafficProfile.load(args.traffic_profile)
+    else:
+        profile = TrafficProfile.office_day(num_floors, bucket_len=3600, peak_rate=float(args.peak_rate))
+
+    sim = ElevatorEventSim(num_elevators=num_elevators,
+                           num_floors=num_floors,
+                           time_per_floor=int(args.time_per_floor),
+                           random_seed=int(args.seed),
+                           arrivals=ProfileArrivals(profile),
+                           chunk_len=profile.period)
+    controller = StandardElevatorV7Controller(sim)
+
+    start = time.time()
+    sim.run(controller, int(num_days * 86400))
+    elapsed = time.time() - start
+
+    print(f"Simulated {num_days} days of {num_elevators} elevators, {num_floors} floors in {elapsed:.1f}s")
+    for name, value in sim.stats().items():
+        print(f"    {name}: {value:.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_floors', '-n', default=10, help='Number of floors')
+    parser.add_argument('--num_elevators', '-e', default=2, help='Number of elevators')
+    parser.add_argument('--days', '-d', default=7, help='Number of days to simulate')
+    parser.add_argument('--time_per_floor', default=2, help='Number of timesteps (seconds) to travel one floor')
+    parser.add_argument('--peak_rate', default=0.05, help='Requests per second at the morning peak of the office profile')
+    parser.add_argument('--traffic_profile', '-p', default=None, help='Path to a TrafficProfile (.npz) to use instead of the office profile')
+    parser.add_argument('--seed', '-s', default=0, help='Random seed to use')
+    args = parser.parse_args()
+    main(args)
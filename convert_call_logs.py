@@ -0,0 +1,70 @@
+import argparse
+import csv
+import json
+
+import numpy as np
+
+from envs.traces import Trace, TraceWriter
+
+
+def to_seconds(values: list) -> np.ndarray:
+    # numeric timestamps (seconds) or ISO 8601 date strings
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        return np.asarray(values, dtype="datetime64[ms]").astype(np.int64) / 1000
+
+
+def read_calls(path: str, time_column: str, origin_column: str, destination_column: str, chunk_size: int):
+    """Yields (times, origins, destinations) lists of at most chunk_size calls from a CSV or JSONL log"""
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        times, origins, destinations = [], [], []
+        for row in rows:
+            times.append(row[time_column])
+            origins.append(int(row[origin_column]))
+            destinations.append(int(row[destination_column]))
+            if len(times) == chunk_size:
+                yield times, origins, destinations
+                times, origins, destinations = [], [], []
+        if times:
+            yield times, origins, destinations
+
+
+def main(args):
+    ticks_per_second = float(args.ticks_per_second)
+    floor_offset = int(args.floor_offset)
+
+    start_time = None
+    with TraceWriter(args.output) as writer:
+        for path in args.logs:
+            for times, origins, destinations in read_calls(path, args.time_column, args.origin_column, args.destination_column, int(args.chunk_size)):
+                seconds = to_seconds(times)
+                if start_time is None:
+                    start_time = seconds[0]
+                ticks = np.floor((seconds - start_time) * ticks_per_second).astype(np.int64)
+                try:
+                    writer.write(ticks, np.asarray(origins) - floor_offset, np.asarray(destinations) - floor_offset)
+                except ValueError as e:
+                    raise ValueError(f"{path}: {e}, with --floor_offset {floor_offset}") from e
+
+    trace = Trace(args.output)
+    print(f"Wrote {trace.num_calls} calls over {trace.num_floors} floors to {args.output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('logs', nargs='+', help='CSV or JSONL hall call logs, sorted by time (and given in time order)')
+    parser.add_argument('--output', '-o', required=True, help='Path of the binary trace to write')
+    parser.add_argument('--time_column', default='time', help='Column with the call time, in seconds or as an ISO 8601 date')
+    parser.add_argument('--origin_column', default='origin', help='Column with the floor the call was made on')
+    parser.add_argument('--destination_column', default='destination', help='Column with the destination floor')
+    parser.add_argument('--ticks_per_second', '-t', default=1, help='Number of env timesteps per second of log time')
+    parser.add_argument('--floor_offset', default=0, help='Number subtracted from logged floors so that the lowest floor is 0 (e.g. -2 with two basement floors -2 and -1); floors must then be between 0 and 65535')
+    parser.add_argument('--chunk_size', default=1_000_000, help='Number of calls converted at a time')
+    args = parser.parse_args()
+    main(args)
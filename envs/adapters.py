@@ -0,0 +1,147 @@
+import numpy as np
+
+from .elevator_base import ElevatorState
+from .encoders import FeatureEncoder, ObservationEncoder, OneHotEncoder
+
+"""
+Translation of one env's observations into the layout of another version, so that models trained on different
+versions can be run side by side on a single simulation (same env instance, same traffic).
+"""
+
+
+class ObservationAdapter:
+    """
+    Precomputed gather from the observation layout of `source` (the encoder of the simulating env, a FeatureEncoder with
+    buttons: v3, v5, v6, v7) to the layout of `target` (FeatureEncoder with buttons or OneHotEncoder: v3 to v7).
+
+    Every target slot is a source slot, compared to a value for one-hot targets, or padding for the elevators past the
+    current number of elevators; __call__ does this as one np.take and one np.where, for one observation or a batch.
+    Fields the source does not have are filled in: time to next floor is 0 (elevators moving one floor per timestep)
+    and the previous direction is the current direction. The target must be at least as large as the source.
+    """
+
+    def __init__(self, source: ObservationEncoder, target: ObservationEncoder):
+        if type(source) is not FeatureEncoder or source.max_people is not None:
+            raise ValueError("the source must be a FeatureEncoder with button observations (v3, v5, v6, v7)")
+        if not isinstance(target, (FeatureEncoder, OneHotEncoder)) or getattr(target, "max_people", None) is not None:
+            raise ValueError("the target must be a FeatureEncoder with button observations or a OneHotEncoder (v3 to v7)")
+        if target.num_elevators < source.num_elevators or target.num_floors < source.num_floors:
+            raise ValueError(f"a target of {target.num_elevators} elevators and {target.num_floors} floors cannot hold a source of {source.num_elevators} elevators and {source.num_floors} floors")
+        self.source = source
+        self.target = target
+        self.one_hot = isinstance(target, OneHotEncoder)
+
+        size = len(target.nvec)
+        self.index = np.zeros(size, dtype=np.int64)
+        self.value = np.ones(size, dtype=np.int64)     # one-hot targets: slot is 1 when the source slot equals value
+        self.missing = np.zeros(size, dtype=bool)      # no source slot, the slot is pad_value
+        self.elevator = np.full(size, -1, dtype=np.int64)  # elevator of the slot, padded when it does not exist yet
+        self.pad_value = np.zeros(size, dtype=np.int64)
+        if self.one_hot:
+            self._build_one_hot()
+        else:
+            self._build_features()
+
+    def _source_field(self, elev_idx: int, field: str) -> int | None:
+        """Source slot of an elevator field ("floor", "target", "ttnf", "prev_direction", "direction"), None if missing"""
+        source = self.source
+        if elev_idx >= source.num_elevators:
+            return None
+        offset = source.elev_offset(elev_idx)
+        if field == "floor":
+            return offset
+        if field == "target":
+            return offset + 1
+        if field == "ttnf":
+            return offset + 2 if source.time_to_next_floor else None
+        if field == "prev_direction" and source.prev_direction:
+            return offset + source.prev_direction_idx
+        return offset + source.direction_idx  # direction, or previous direction when the source does not have it
+
+    def _source_button(self, elev_idx: int, floor: int) -> int | None:
+        if elev_idx >= self.source.num_elevators or floor >= self.source.num_floors:
+            return None
+        return self.source.elev_offset(elev_idx) + self.source.buttons_idx + floor
+
+    def _set(self, slot: int, source_slot: int | None, value: int = 1, elev_idx: int = -1, pad_value: int = 0):
+        if source_slot is None:
+            self.missing[slot] = True
+        else:
+            self.index[slot] = source_slot
+        self.value[slot] = value
+        self.elevator[slot] = elev_idx
+        self.pad_value[slot] = pad_value
+
+    def _build_features(self):
+        target = self.target
+        self._set(0, 0)
+        self._set(1, 1)
+        for i in range(target.num_elevators):
+            offset = target.elev_offset(i)
+            self._set(offset, self._source_field(i, "floor"), elev_idx=i)
+            self._set(offset + 1, self._source_field(i, "target"), elev_idx=i)
+            if target.time_to_next_floor:
+                self._set(offset + 2, self._source_field(i, "ttnf"), elev_idx=i)
+            if target.prev_direction:
+                self._set(offset + target.prev_direction_idx, self._source_field(i, "prev_direction"), elev_idx=i)
+            self._set(offset + target.direction_idx, self._source_field(i, "direction"), elev_idx=i, pad_value=ElevatorState.IDLE)
+            for j in range(target.num_floors):
+                self._set(offset + target.buttons_idx + j, self._source_button(i, j), elev_idx=i)
+        self._set_halls()
+
+    def _build_one_hot(self):
+        target = self.target
+        for v in range(target.num_elevators + 1):
+            self._set(v, 0, value=v)
+        for v in range(target.num_floors + 1):
+            self._set(target.floors_offset + v, 1, value=v)
+        num_floors = target.num_floors
+        for i in range(target.num_elevators):
+            offset = target.elev_offset(i)
+            for j in range(num_floors):
+                self._set(offset + j, self._source_field(i, "floor"), value=j, elev_idx=i)
+                self._set(offset + num_floors + j, self._source_field(i, "target"), value=j, elev_idx=i)
+            # every direction is set for elevators that do not exist yet
+            for d in range(3):
+                self._set(offset + 2 * num_floors + d, self._source_field(i, "direction"), value=d, elev_idx=i, pad_value=1)
+            for j in range(num_floors):
+                self._set(offset + 2 * num_floors + 3 + j, self._source_button(i, j), elev_idx=i)
+        self._set_halls()
+
+    def _set_halls(self):
+        source, target = self.source, self.target
+        for j in range(target.num_floors):
+            in_source = j < source.num_floors
+            self._set(target.up_offset + j, source.up_offset + j if in_source else None)
+            self._set(target.down_offset + j, source.down_offset + j if in_source else None)
+
+    def __call__(self, obs: np.ndarray) -> np.ndarray:
+        """Target observation(s) of source observation(s), obs of shape (..., source size)"""
+        values = np.take(obs, self.index, axis=-1)
+        if self.one_hot:
+            values = values == self.value
+        padded = self.missing | (self.elevator >= obs[..., 0, None])  # obs[0]: current number of elevators
+        return np.where(padded, self.pad_value, values)
+
+    def action(self, action: np.ndarray, obs: np.ndarray) -> np.ndarray:
+        """Source env action for a target model's action, given the source observation it was taken on"""
+        source = self.source
+        if self.one_hot:
+            # as OneHotEncoder.apply_action: first selected floor among the current floors
+            one_hot = action.reshape(*action.shape[:-1], self.target.num_elevators, self.target.num_floors)
+            one_hot = one_hot[..., : source.num_elevators, : source.num_floors]
+            current = np.arange(source.num_floors) < obs[..., 1, None, None]
+            return np.argmax(np.where(current, one_hot, -1), axis=-1)
+        return np.minimum(action[..., : source.num_elevators], source.num_floors - 1)
+
+
+class AdaptedModel:
+    """A model (anything with SB3's predict) trained on the adapter's target layout, run on the source env"""
+
+    def __init__(self, model, adapter: ObservationAdapter):
+        self.model = model
+        self.adapter = adapter
+
+    def predict(self, obs: np.ndarray, deterministic: bool = False):
+        action, state = self.model.predict(self.adapter(obs), deterministic=deterministic)
+        return self.adapter.action(action, obs), state
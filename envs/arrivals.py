@@ -0,0 +1,137 @@
+import numpy as np
+
+
+class ArrivalStream:
+    """
+    All arrivals of one episode, sorted by time, consumed by the env through a cursor.
+
+    times[k] is the timestep on which request k appears at starting_floors[k], going to target_floors[k].
+    """
+
+    def __init__(self, times: np.ndarray, starting_floors: np.ndarray, target_floors: np.ndarray):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.starting_floors = np.asarray(starting_floors, dtype=np.int64)
+        self.target_floors = np.asarray(target_floors, dtype=np.int64)
+
+        # python lists make the per-step lookups much cheaper than numpy scalar indexing
+        self._times: list[int] = self.times.tolist()
+        self._arrivals: list[tuple[int, int]] = list(zip(self.starting_floors.tolist(), self.target_floors.tolist()))
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self._times)
+
+    def pop(self, t: int) -> list[tuple[int, int]]:
+        """Returns the (starting floor, target floor) of every arrival up to timestep t that has not been returned yet"""
+        start = self.cursor
+        return self._arrivals[start : self.advance(t)]
+
+    def advance(self, t: int) -> int:
+        """
+        Moves the cursor past every arrival up to timestep t and returns it: the arrivals of the previous cursor up to
+        it are arrival(k). Unlike pop, creates no list.
+        """
+        end = self.cursor
+        times = self._times
+        while end < len(times) and times[end] <= t:
+            end += 1
+        self.cursor = end
+        return end
+
+    def arrival(self, k: int) -> tuple[int, int]:
+        """(starting floor, target floor) of arrival k"""
+        return self._arrivals[k]
+
+    def peek_time(self) -> int | None:
+        """Time of the next arrival that has not been returned yet, None when the stream is exhausted"""
+        return self._times[self.cursor] if self.cursor < len(self._times) else None
+
+    def next(self) -> tuple[int, int]:
+        """Returns the (starting floor, target floor) of the next arrival"""
+        arrival = self._arrivals[self.cursor]
+        self.cursor += 1
+        return arrival
+
+    def copy(self) -> "ArrivalStream":
+        """Same arrivals with the cursor back at the start (the arrays and lists are shared, they are never modified)"""
+        stream = ArrivalStream.__new__(ArrivalStream)
+        stream.times, stream.starting_floors, stream.target_floors = self.times, self.starting_floors, self.target_floors
+        stream._times, stream._arrivals = self._times, self._arrivals
+        stream.cursor = 0
+        return stream
+
+    def save(self, path: str):
+        np.savez_compressed(path, times=self.times, starting_floors=self.starting_floors, target_floors=self.target_floors)
+
+    @classmethod
+    def load(cls, path: str) -> "ArrivalStream":
+        with np.load(path) as data:
+            return cls(data["times"], data["starting_floors"], data["target_floors"])
+
+    def __repr__(self):
+        return f"ArrivalStream[{len(self)} arrivals, {self.cursor=}]"
+
+
+class UniformArrivals:
+    """At most one request per timestep with probability request_prob, uniform starting and (different) target floor"""
+
+    def __init__(self, request_prob: float = 0.3):
+        self.request_prob = request_prob
+
+    def sample(self, rng: np.random.Generator, num_floors: int, num_steps: int) -> ArrivalStream:
+        times = np.flatnonzero(rng.random(num_steps) < self.request_prob)
+        starting_floors = rng.integers(num_floors, size=times.size)
+        target_floors = rng.integers(num_floors - 1, size=times.size)
+        target_floors += target_floors >= starting_floors
+        return ArrivalStream(times, starting_floors, target_floors)
+
+
+class NoArrivals:
+    """No requests at all, for scripted scenarios where every passenger is placed at reset"""
+
+    def sample(self, rng: np.random.Generator, num_floors: int, num_steps: int) -> ArrivalStream:
+        empty = np.zeros(0, dtype=np.int64)
+        return ArrivalStream(empty, empty, empty)
+
+
+class PoissonArrivals:
+    """
+    High-load traffic: every floor has its own arrival rate (expected requests per timestep), so several
+    requests can appear on the same timestep. Targets are uniform over the other floors.
+
+    floor_rates is a single rate for every floor or one rate per floor (at least num_floors of them).
+    """
+
+    def __init__(self, floor_rates: float | list[float] | np.ndarray):
+        self.floor_rates = np.asarray(floor_rates, dtype=np.float64)
+
+    def sample(self, rng: np.random.Generator, num_floors: int, num_steps: int) -> ArrivalStream:
+        rates = np.broadcast_to(self.floor_rates, (num_floors,)) if self.floor_rates.ndim == 0 else self.floor_rates[:num_floors]
+        counts = rng.poisson(rates, size=(num_steps, num_floors))
+
+        # one row per request, ordered by time then by starting floor
+        times, starting_floors = np.nonzero(counts)
+        repeats = counts[times, starting_floors]
+        times = np.repeat(times, repeats)
+        starting_floors = np.repeat(starting_floors, repeats)
+
+        target_floors = rng.integers(num_floors - 1, size=times.size)
+        target_floors += target_floors >= starting_floors
+        return ArrivalStream(times, starting_floors, target_floors)
+
+
+class ReplayArrivals:
+    """Replays previously exported streams, one per episode (cycling), so that every controller sees the same traffic"""
+
+    def __init__(self, streams: list[ArrivalStream]):
+        self.streams = streams
+        self.episode = 0
+
+    @classmethod
+    def load(cls, paths: list[str]) -> "ReplayArrivals":
+        return cls([ArrivalStream.load(path) for path in paths])
+
+    def sample(self, rng: np.random.Generator, num_floors: int, num_steps: int) -> ArrivalStream:
+        stream = self.streams[self.episode % len(self.streams)].copy()
+        self.episode += 1
+        return stream
@@ -0,0 +1,64 @@
+import gym
+import numpy as np
+
+from .elevator_base import ElevatorState
+
+"""
+Semi-MDP view of the elevator envs: the policy is only queried at decision points instead of at every timestep.
+"""
+
+
+class DecisionPointWrapper(gym.Wrapper):
+    """
+    Wraps an elevator env (v2 onwards). step keeps the action, i.e. every elevator's target floor, for as many timesteps
+    as it takes to reach a decision point:
+        an elevator reaches a floor (on_floor=True) or stops at its target,
+        a new request appears,
+        the episode ends,
+        or max_duration timesteps have passed.
+    It returns the discounted reward of those timesteps, sum over k of gamma^k * r_k, with info["duration"] the number
+    of timesteps and info["reward_sum"] their undiscounted reward (what benchmarks add up).
+
+    A learner with discount gamma discounts the next decision by gamma rather than gamma^duration; info["duration"] is
+    there for learners that take variable durations into account.
+    """
+
+    def __init__(self, env: gym.Env, gamma: float = 0.99, on_floor: bool = True, max_duration: int | None = None):
+        super().__init__(env)
+        self.gamma = gamma
+        self.on_floor = on_floor
+        self.max_duration = max_duration
+
+    def _decision_point(self, floors: list[int], states: list[int]) -> bool:
+        sim = self.env.unwrapped
+        for i, elevator in enumerate(sim.elevators):
+            if self.on_floor and elevator.floor != floors[i]:
+                return True
+            if elevator.state == ElevatorState.IDLE and states[i] != ElevatorState.IDLE:
+                return True
+        return False
+
+    def step(self, action: np.ndarray):
+        sim = self.env.unwrapped
+        discounted_reward = 0
+        reward_sum = 0
+        discount = 1
+        duration = 0
+        while True:
+            floors = [elevator.floor for elevator in sim.elevators]
+            states = [elevator.state for elevator in sim.elevators]
+            num_requests = sim.num_total_requests
+
+            obs, reward, done, info = self.env.step(action)
+            discounted_reward += discount * reward
+            reward_sum += reward
+            discount *= self.gamma
+            duration += 1
+
+            if done or sim.num_total_requests > num_requests or self._decision_point(floors, states):
+                break
+            if self.max_duration is not None and duration >= self.max_duration:
+                break
+
+        info = dict(info, duration=duration, reward_sum=reward_sum)
+        return obs, discounted_reward, done, info
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import IntEnum
 
+from .passenger_counts import CountRequestsMixin
+
 
 @dataclass(frozen=True)
 class Request:
@@ -28,6 +30,16 @@ class Elevator:
             self.requests[request.target_floor] = []
         self.requests[request.target_floor].append(request)
 
+    def clear_requests(self):
+        self.requests.clear()
+
+    def reset(self, floor: int = 0, target_floor: int = 0):
+        """Puts the elevator back, idle and empty, at floor (reuses the object across episodes)"""
+        self.floor = floor
+        self.target_floor = target_floor
+        self.state = ElevatorState.IDLE
+        self.clear_requests()
+
     def batch_remove_requests(self, floor: int | None = None) -> int:
         if floor is None:
             floor = self.floor
@@ -67,3 +79,10 @@ class Elevator:
 
     def __repr__(self):
         return f"Elevator[{self.floor=}, {self.target_floor=}, {self.state=}, {self.requests=}]"
+
+
+class CountElevator(CountRequestsMixin, Elevator):
+    """Elevator with per-floor passenger counts instead of Request lists (same movement)"""
+
+    def __repr__(self):
+        return f"CountElevator[{self.floor=}, {self.target_floor=}, {self.state=}, {self.requests=}]"
@@ -0,0 +1,378 @@
+from dataclasses import dataclass
+from typing import Callable
+
+import gym
+from gym import spaces
+import numpy as np
+
+from . import elevator_base, elevator_base_v2
+from .arrivals import UniformArrivals
+from .elevator_base import ElevatorState, Request
+from .encoders import FeatureEncoder, ObservationEncoder, PackedEncoder, TokenEncoder
+from .passenger_counts import HallQueue
+from .profiling import StepProfiler
+from .rewards import WaitingReward
+from .snapshot import EnvSnapshot, restore_env, snapshot_env
+
+"""
+Simulation shared by every ElevatorVxEnv (v2 onwards). The versions only differ in:
+    movement: how elevators move between floors (MovementModel)
+    encoder:  the observation and action layout (encoders.py)
+    reward:   the reward function (rewards.py)
+    curriculum_metric: what decides that the agent is ready for the next curriculum stage
+The other options (count_based, pooled, compact_obs, packed_obs, token_obs, profile) only change how the simulation is stored and
+run or how it is observed; every env version accepts them as keyword arguments.
+"""
+
+
+@dataclass(frozen=True)
+class MovementModel:
+    elevator_class: type
+    count_elevator_class: type  # same movement, with passenger counts instead of Request lists
+
+
+# elevator_base: TIME_PER_FLOOR timesteps per floor, an elevator only stops or turns around at a floor
+TIMED_MOVEMENT = MovementModel(elevator_base.Elevator, elevator_base.CountElevator)
+# elevator_base_v2: one floor per timestep, the direction can change at every timestep
+DIRECT_MOVEMENT = MovementModel(elevator_base_v2.Elevator, elevator_base_v2.CountElevator)
+
+
+class ElevatorCoreEnv(gym.Env):
+    metadata = {"render.modes": ["human"], "video.frames_per_second": 15}
+
+    def __init__(self, num_elevators_start: int = 1, num_floors_start: int = 3, curriculum: bool = False, num_elevators_end: int = -1, num_floors_end: int = -1, episode_len: int = 200, random_seed: int = 0, request_prob: float = 0.3, arrivals=None, count_based: bool = False, pooled: bool = False, compact_obs: bool = False, packed_obs: bool = False, token_obs: bool = False, profile: bool = False,
+                 movement: MovementModel = DIRECT_MOVEMENT, encoder: Callable[[int, int], ObservationEncoder] = FeatureEncoder, reward=None, curriculum_metric: str = "dropped_off"):
+        self.num_elevators: int = num_elevators_start
+        self.num_floors: int = num_floors_start
+        self.curriculum = curriculum
+
+        self.num_floors_start = num_floors_start
+        self.num_elevators_start = num_elevators_start
+        self.num_elevators_end = num_elevators_end if self.curriculum else self.num_elevators_start
+        self.num_floors_end = num_floors_end if self.curriculum else self.num_floors_start
+
+        self.episode_len: int = episode_len
+
+        self.movement = movement
+        self.encoder = encoder(self.num_elevators_end, self.num_floors_end)
+        self.reward = reward if reward is not None else WaitingReward()
+        self.curriculum_metric = curriculum_metric  # "dropped_off" (fraction of requests delivered) or "reward"
+
+        if packed_obs and token_obs:
+            raise ValueError("packed_obs and token_obs are different observations, choose one")
+        if packed_obs:
+            # button vectors packed 8 floors per byte (PackedEncoder)
+            self.encoder = PackedEncoder(self.encoder)
+        if token_obs:
+            # Dict of per-elevator and per-floor tokens with target floor actions, whatever the version's encoder (TokenEncoder)
+            self.encoder = TokenEncoder(self.num_elevators_end, self.num_floors_end)
+        self.observation_space: spaces.Space = self.encoder.observation_space(compact_obs)
+        self.action_space: spaces.Space = spaces.MultiDiscrete(self.encoder.action_nvec)
+        # named fields of the observation vector, see encoders.view_observation (None for token observations)
+        self.observation_layout: np.dtype | None = self.encoder.layout(self.observation_space.dtype)
+
+        self.request_prob = request_prob
+
+        # source of each episode's arrival stream (UniformArrivals, ReplayArrivals, ...)
+        self.arrivals = arrivals if arrivals is not None else UniformArrivals(request_prob)
+
+        # store passengers as per-floor counts (CountElevator, HallQueue) instead of Request objects
+        self.count_based = count_based or pooled
+
+        # reuse the elevators and hall queues across episodes, and return the observation buffer itself from step
+        # (valid until the next step or reset), so that steps only create short-lived temporaries (see test/test_pooled_env.py)
+        self.pooled = pooled
+
+        # preallocated observation, the encoder updates the slots that change during a step
+        self._obs = self.encoder.new_buffer(self.observation_space)
+        self._obs_views = self.encoder.observation(self._obs, copy=False)  # returned by pooled steps
+        self._info = {}  # the empty info of pooled steps, as the observation: not to be modified
+
+        self.rng = np.random.default_rng(random_seed)
+        self.elevators = []
+
+        # time the phases of step (see StepProfiler), nothing is timed when profile is False
+        self.profiler = StepProfiler() if profile else None
+        if self.profiler is not None:
+            self._instrument()
+        self._init_state()
+
+        self._reset_history()
+
+    def _init_state(self):
+        reuse = self.pooled and len(self.elevators) == self.num_elevators and self.elevators[0].num_floors == self.num_floors  # same curriculum stage
+        if reuse:
+            for elevator in self.elevators:
+                elevator.reset()
+            for queue in self.unassigned_requests.values():
+                queue.clear()
+        elif self.count_based:
+            self.elevators = [self.movement.count_elevator_class(0, 0, self.num_floors) for _ in range(self.num_elevators)]  # all elevators at ground
+            self.unassigned_requests: dict[int, HallQueue] = {i: HallQueue(i, self.num_floors) for i in range(self.num_floors)}
+        else:
+            self.elevators = [self.movement.elevator_class(0, 0, self.num_floors) for _ in range(self.num_elevators)]  # all elevators at ground
+            self.unassigned_requests: dict[int, list[Request]] = {i: list() for i in range(self.num_floors)}
+        self.num_waiting = 0
+        self.num_riding = 0
+        # sums of time_requested of the waiting and riding passengers, for rewards that depend on waiting times
+        self.waiting_time_sum = 0
+        self.riding_time_sum = 0
+
+        self._place_passengers()
+
+        self.t = 0
+        self.total_t = 0
+
+        # draw the whole episode's arrivals at once, step consumes them with a cursor
+        sample = self.arrivals.sample if self.profiler is None else self.profiler.wrap("arrival_sampling", self.arrivals.sample)
+        self.arrival_stream = sample(self.rng, self.num_floors, self.episode_len + 1)
+
+        self.num_dropped_off = 0
+        self.num_total_requests = 0
+        self.episode_rew = 0
+        if reuse:
+            for i in range(self.num_elevators_end):
+                self.prev_elev_direction[i] = ElevatorState.IDLE
+        else:
+            self.prev_elev_direction = [ElevatorState.IDLE for _ in range(self.num_elevators_end)]
+
+        if self.profiler is not None:
+            self._instrument_episode()
+        self._rebuild_obs()
+
+    def _place_passengers(self):
+        """Passengers present at the start of an episode (none by default)"""
+        pass
+
+    def _add_waiting(self, floor: int, target_floor: int, time_requested: int):
+        if self.count_based:
+            self.unassigned_requests[floor].add(target_floor, time_requested)
+        else:
+            self.unassigned_requests[floor].append(Request(time_requested, target_floor))
+        self.num_waiting += 1
+        self.waiting_time_sum += time_requested
+
+    def add_request(self, starting_floor: int, target_floor: int, time_requested: int):
+        """New passenger waiting on starting_floor, as the arrivals of step do (also used for passengers from outside the arrival stream)"""
+        self._add_waiting(starting_floor, target_floor, time_requested)
+        self.num_total_requests += 1
+        self.encoder.arrival(self, self._obs, starting_floor, target_floor)
+
+    def _add_riding(self, elevator, request: Request):
+        elevator.add_request(request)
+        self.num_riding += 1
+        self.riding_time_sum += request.time_requested
+
+    def passengers_to(self, elevator, floor: int) -> int:
+        """Number of passengers in elevator going to floor"""
+        if self.count_based:
+            return elevator.requests[floor]
+        return len(elevator.requests.get(floor, []))
+
+    def _time_sum_to(self, elevator, floor: int) -> int:
+        """Sum of time_requested of the passengers in elevator going to floor"""
+        if self.count_based:
+            return elevator.request_time_sum[floor]
+        return sum(request.time_requested for request in elevator.requests.get(floor, []))
+
+    def hall_calls(self, floor: int) -> tuple[int, int]:
+        """Number of passengers waiting on floor to go up and down"""
+        queue = self.unassigned_requests[floor]
+        if self.count_based:
+            return queue.num_up, queue.num_down
+        num_up = sum(request.target_floor > floor for request in queue)
+        return num_up, len(queue) - num_up
+
+    def _reset_history(self):
+        self.history_len = 10
+        self.dropped_off_history = []
+        self.requests_history = []
+        self.reward_history = []
+
+    def _update_curriculum(self):
+        if self.num_elevators < self.num_elevators_end and (self.num_floors - self.num_floors_start) / (self.num_floors_end - self.num_floors_start) >= (self.num_elevators + 1 - self.num_elevators_start) / (self.num_elevators_end - self.num_elevators_start):
+            print(f"Updating curriculum: num_elevators {self.num_elevators} -> {self.num_elevators + 1}")
+            self.num_elevators += 1
+            self._reset_history()
+        elif self.num_floors < self.num_floors_end:
+            print(f"Updating curriculum: num_floors {self.num_floors} -> {self.num_floors + 1}")
+            self.num_floors += 1
+            self._reset_history()
+
+    def _curriculum_ready(self) -> bool:
+        if len(self.dropped_off_history) < self.history_len:
+            return False
+        if self.curriculum_metric == "reward":
+            threshold = -80 - 50 * (self.num_floors - 3)
+            return sum(self.reward_history) / self.history_len > threshold
+
+        if self.num_floors <= 4:
+            threshold = 0.7
+        elif self.num_floors <= 6:
+            threshold = 0.5
+        elif self.num_floors <= 8:
+            threshold = 0.375
+        else:
+            threshold = 0.3
+        return sum(self.dropped_off_history) > threshold * sum(self.requests_history)
+
+    def reset(self, override_curriculum=False, log=False):
+        self.dropped_off_history.append(self.num_dropped_off)
+        self.requests_history.append(self.num_total_requests)
+        self.reward_history.append(self.episode_rew)
+        if len(self.dropped_off_history) > self.history_len:
+            self.dropped_off_history.pop(0)
+            self.requests_history.pop(0)
+            self.reward_history.pop(0)
+
+        # check if we should update curriculum
+        if not override_curriculum and self._curriculum_ready():
+            self._update_curriculum()
+
+        self._init_state()
+
+        return self.get_obs()
+
+    def action_masks(self) -> np.ndarray:
+        """Valid values of every action dimension at the current curriculum stage, flattened (for MaskablePPO)"""
+        return self.encoder.action_mask(self)
+
+    def snapshot(self) -> EnvSnapshot:
+        """Immutable copy of the simulation state (elevators, queues, counters, rng), see restore"""
+        return snapshot_env(self)
+
+    def restore(self, snapshot: EnvSnapshot):
+        restore_env(self, snapshot)
+        if self.profiler is not None:
+            self._instrument_episode()
+        self._rebuild_obs()
+
+    def to_bytes(self) -> bytes:
+        """Simulation state as compact versioned bytes (EnvSnapshot.to_bytes), for other processes or files, see from_bytes"""
+        return snapshot_env(self).to_bytes()
+
+    def from_bytes(self, data: bytes):
+        """Puts the env in the state of to_bytes data, written by an env of the same version, sizes and count_based option"""
+        snapshot = EnvSnapshot.from_bytes(data, self.movement.count_elevator_class if self.count_based else self.movement.elevator_class)
+        if snapshot.count_based != self.count_based:
+            raise ValueError(f"state of a count_based={snapshot.count_based} env, this env has count_based={self.count_based}")
+        if snapshot.num_elevators > self.num_elevators_end or snapshot.num_floors > self.num_floors_end or len(snapshot.prev_elev_direction) != self.num_elevators_end:
+            raise ValueError(f"state of {snapshot.num_elevators} elevators and {snapshot.num_floors} floors does not fit this env's observations")
+        self.restore(snapshot)
+
+    def _instrument(self):
+        """
+        Times the phases of step and reset with self.profiler. Only the methods of objects the env creates are wrapped:
+        the reward and the arrivals may be shared with other envs, they are timed where step and reset call them.
+        """
+        profiler = self.profiler
+        profiler.instrument(self, "step")
+        profiler.instrument(self, "reset")
+        profiler.instrument(self.action_space, "contains", "action_check")
+        profiler.instrument(self.encoder, "apply_action")
+        profiler.instrument(self, "_board", "board")
+        profiler.instrument(self, "add_request")
+        profiler.instrument(self.encoder, "elevator", "obs_update")
+        profiler.instrument(self, "get_obs")
+
+    def _instrument_episode(self):
+        """Times the phases of the elevators created for an episode (or by restore)"""
+        profiler = self.profiler
+        for elevator in self.elevators:
+            profiler.instrument(elevator, "update_state")
+            profiler.instrument(elevator, "batch_remove_requests", "alight")
+
+    def _rebuild_obs(self):
+        """Writes every slot of the observation buffer from the current state"""
+        self.encoder.rebuild(self, self._obs)
+
+    def get_obs(self):
+        return self.encoder.observation(self._obs)
+
+    def _board(self, elev_idx: int, elevator):
+        """Moves the passengers waiting on the elevator's floor into it"""
+        floor = elevator.floor
+        queue = self.unassigned_requests[floor]
+        if self.count_based:
+            time_sum = queue.up_time_sum + queue.down_time_sum
+            num_boarded = queue.board(elevator)
+            target_floors = queue.boarded_floors
+            num_target_floors = queue.num_boarded_floors
+        else:
+            target_floors = {request.target_floor for request in queue}
+            time_sum = 0
+            for request in queue:
+                elevator.add_request(request)
+                time_sum += request.time_requested
+            num_boarded = len(queue)
+            self.unassigned_requests[floor] = []
+            target_floors = list(target_floors)
+            num_target_floors = len(target_floors)
+        self.num_waiting -= num_boarded
+        self.num_riding += num_boarded
+        self.waiting_time_sum -= time_sum
+        self.riding_time_sum += time_sum
+
+        for i in range(num_target_floors):
+            self.encoder.car_button(self, self._obs, elev_idx, target_floors[i])
+        self.encoder.hall(self, self._obs, floor)
+
+    def step(self, action: np.ndarray):
+        """Returns (state, reward, done, info)"""
+
+        # handle action
+        assert self.action_space.contains(action), f"Invalid action {action} for space {self.action_space}"
+        obs, encoder = self._obs, self.encoder
+        encoder.apply_action(self, action)
+
+        # update elevators
+        num_released = 0
+        for elev_idx, elevator in enumerate(self.elevators):
+            self.prev_elev_direction[elev_idx] = elevator.state
+            elevator.update_state()
+
+            if elevator.state == ElevatorState.IDLE:
+                # release passengers
+                released_time_sum = self._time_sum_to(elevator, elevator.floor)
+                num_released_requests = elevator.batch_remove_requests(elevator.floor)
+                if num_released_requests:
+                    num_released += num_released_requests
+                    self.num_riding -= num_released_requests
+                    self.riding_time_sum -= released_time_sum
+                    encoder.car_button(self, obs, elev_idx, elevator.floor)
+
+                # add waiting passengers
+                if len(self.unassigned_requests[elevator.floor]) > 0:
+                    self._board(elev_idx, elevator)
+
+            encoder.elevator(self, obs, elev_idx)
+        self.num_dropped_off += num_released
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+        reward = self.reward(self, num_released)
+        if profiler is not None:
+            profiler.lap("reward")
+
+        # add new requests
+        stream = self.arrival_stream
+        k = stream.cursor
+        end = stream.advance(self.t)
+        while k < end:
+            starting_floor, target_floor = stream.arrival(k)
+            self.add_request(starting_floor, target_floor, self.t)
+            k += 1
+        if profiler is not None:
+            profiler.lap("arrivals")  # includes add_request
+
+        self.t += 1
+        self.total_t += 1
+
+        done = self.t > self.episode_len
+
+        self.episode_rew += reward
+
+        if self.pooled and not done:
+            return self._obs_views, reward, done, self._info
+        return self.get_obs(), reward, done, {}
@@ -0,0 +1,260 @@
+import heapq
+from enum import IntEnum
+
+import numpy as np
+
+from .arrivals import UniformArrivals
+from .elevator_base_v2 import ElevatorState
+from .encoders import FeatureEncoder
+
+"""
+Discrete-event version of the ElevatorV7Env dynamics for long (day or week) capacity studies.
+
+Timestep t of the simulation is step t of ElevatorV7Env: cars move and open their doors during t, requests that
+arrive during t appear after that, and a controller decision made at t is acted upon from t + 1. Instead of
+visiting every timestep, the simulation only processes events:
+    ARRIVAL: a request appears at a floor
+    FLOOR:   a car updates its position (one floor per time_per_floor timesteps, as in ElevatorV7Env when it is 1)
+    DOORS:   a car that is stopped at its target floor releases and picks up passengers
+The controller (e.g. StandardElevatorV7Controller) is only asked for new targets at decision events: when a request
+arrives, or when a car stops at its target or picks up passengers.
+"""
+
+
+class EventType(IntEnum):
+    # events of the same timestep are processed in this order (and by car index), as in ElevatorV7Env.step
+    FLOOR = 0
+    DOORS = 1
+    ARRIVAL = 2
+
+
+class EventCar:
+    def __init__(self, num_floors: int):
+        self.floor = 0
+        self.target_floor = 0
+        self.state = ElevatorState.IDLE
+        self.prev_state = ElevatorState.IDLE
+        self.last_update = -1           # timestep of the last FLOOR event, prev direction is only kept for that timestep
+        self.arrival_time = -1          # timestep on which the car reaches the next floor, -1 when not between floors
+        self.has_event = False          # at most one FLOOR or DOORS event is queued per car
+
+        # passengers going to each floor, as (time requested, time boarded)
+        self.passengers: list[list[tuple[int, int]]] = [[] for _ in range(num_floors)]
+        self.num_passengers = 0
+
+
+class ElevatorEventSim:
+    def __init__(self, num_elevators: int = 1, num_floors: int = 3, time_per_floor: int = 1, random_seed: int = 0, request_prob: float = 0.3, arrivals=None, chunk_len: int = 86400):
+        # same names as ElevatorV7Env so that controllers written for it can be used as is
+        self.num_elevators = self.num_elevators_end = num_elevators
+        self.num_floors = self.num_floors_end = num_floors
+
+        self.time_per_floor = time_per_floor
+        self.arrivals = arrivals if arrivals is not None else UniformArrivals(request_prob)
+        self.chunk_len = chunk_len  # number of timesteps of arrivals sampled at a time
+        self.rng = np.random.default_rng(random_seed)
+
+        self.elev_obs_len = 4 + num_floors
+        self.up_offset = 2 + num_elevators * self.elev_obs_len
+        self.down_offset = self.up_offset + num_floors
+        self.obs_len = self.down_offset + num_floors
+        self.observation_layout = FeatureEncoder(num_elevators, num_floors).layout()
+
+        self._init_state()
+
+    def _init_state(self):
+        self.t = 0
+        self.cars = [EventCar(self.num_floors) for _ in range(self.num_elevators)]
+
+        # waiting passengers on each floor, as (time requested, target floor)
+        self.waiting: list[list[tuple[int, int]]] = [[] for _ in range(self.num_floors)]
+        self.num_up_waiting = [0] * self.num_floors
+        self.num_down_waiting = [0] * self.num_floors
+
+        self.events: list[tuple[int, int, int, int]] = []  # (time, EventType, car index or arrival index, sequence)
+        self.num_events = 0
+        self.num_decisions = 0
+
+        self.chunk_start = -self.chunk_len
+        self._next_chunk()
+
+        # per passenger statistics
+        self.num_total_requests = 0
+        self.request_times: list[int] = []
+        self.wait_times: list[int] = []
+        self.ride_times: list[int] = []
+
+    def reset(self):
+        self._init_state()
+
+    def _push(self, time: int, event_type: EventType, index: int):
+        heapq.heappush(self.events, (time, event_type, index, self.num_events))
+        self.num_events += 1
+
+    def _next_chunk(self):
+        # arrivals are sampled chunk_len timesteps at a time, only the next one is queued
+        self.chunk_start += self.chunk_len
+        self.arrival_stream = self.arrivals.sample(self.rng, self.num_floors, self.chunk_len)
+        self._schedule_next_arrival()
+
+    def _schedule_next_arrival(self):
+        next_time = self.arrival_stream.peek_time()
+        if next_time is None:
+            # no arrivals left in this chunk, sample the next one when it starts
+            self._push(self.chunk_start + self.chunk_len, EventType.ARRIVAL, -1)
+        else:
+            self._push(self.chunk_start + next_time, EventType.ARRIVAL, self.arrival_stream.cursor)
+
+    def _schedule_car(self, car_idx: int, time: int, event_type: EventType = EventType.FLOOR):
+        self.cars[car_idx].has_event = True
+        self._push(time, event_type, car_idx)
+
+    def _on_floor(self, car_idx: int, t: int) -> bool:
+        """ElevatorBaseV2.update_state, with time_per_floor timesteps between floors. Returns whether the car stopped at its target"""
+        car = self.cars[car_idx]
+        car.has_event = False
+        car.prev_state = car.state
+        car.last_update = t
+
+        moved = False
+        if car.arrival_time < 0 and car.floor != car.target_floor:
+            # leave the current floor
+            car.state = ElevatorState.MOVING_UP if car.target_floor > car.floor else ElevatorState.MOVING_DOWN
+            car.arrival_time = t + self.time_per_floor - 1
+        if car.arrival_time >= 0:
+            if t < car.arrival_time:
+                self._schedule_car(car_idx, car.arrival_time)
+                return False
+            car.floor += 1 if car.state == ElevatorState.MOVING_UP else -1
+            car.arrival_time = -1
+            moved = True
+
+        if car.floor == car.target_floor:
+            car.state = ElevatorState.IDLE
+            self._schedule_car(car_idx, t, EventType.DOORS)
+            return moved
+        car.state = ElevatorState.MOVING_UP if car.target_floor > car.floor else ElevatorState.MOVING_DOWN
+        self._schedule_car(car_idx, t + 1)
+        return False
+
+    def _on_doors(self, car_idx: int, t: int) -> bool:
+        """Releases and picks up passengers, returns whether anyone got on"""
+        car = self.cars[car_idx]
+        car.has_event = False
+        floor = car.floor
+
+        # release passengers
+        released = car.passengers[floor]
+        if released:
+            for time_requested, time_boarded in released:
+                self.wait_times.append(time_boarded - time_requested)
+                self.ride_times.append(t - time_boarded)
+            car.num_passengers -= len(released)
+            car.passengers[floor] = []
+
+        # add waiting passengers
+        boarding = self.waiting[floor]
+        if not boarding:
+            return False
+        for time_requested, target_floor in boarding:
+            car.passengers[target_floor].append((time_requested, t))
+        car.num_passengers += len(boarding)
+        self.waiting[floor] = []
+        self.num_up_waiting[floor] = 0
+        self.num_down_waiting[floor] = 0
+        return True
+
+    def _on_arrival(self, t: int):
+        starting_floor, target_floor = self.arrival_stream.next()
+
+        self.waiting[starting_floor].append((t, target_floor))
+        if target_floor > starting_floor:
+            self.num_up_waiting[starting_floor] += 1
+        else:
+            self.num_down_waiting[starting_floor] += 1
+        self.num_total_requests += 1
+        self.request_times.append(t)
+
+        self._schedule_next_arrival()
+
+    def get_obs(self):
+        """ElevatorV7Env observation at the end of the current timestep"""
+        obs = np.zeros(self.obs_len, dtype=np.int64)
+        obs[0] = self.num_elevators
+        obs[1] = self.num_floors
+        for i, car in enumerate(self.cars):
+            offset = 2 + i * self.elev_obs_len
+            obs[offset] = car.floor
+            obs[offset + 1] = car.target_floor
+            obs[offset + 2] = car.prev_state if car.last_update == self.t else car.state
+            obs[offset + 3] = car.state
+            for j in range(self.num_floors):
+                obs[offset + 4 + j] = int(len(car.passengers[j]) > 0)
+        obs[self.up_offset:self.down_offset] = np.array(self.num_up_waiting) > 0
+        obs[self.down_offset:] = np.array(self.num_down_waiting) > 0
+        return obs
+
+    def run(self, controller, num_steps: int):
+        """Simulates timesteps [t, t + num_steps), querying controller.predict(obs) at decision events only"""
+        end = self.t + num_steps
+        while self.events and self.events[0][0] < end:
+            t = self.events[0][0]
+            self.t = t
+
+            # process every event of timestep t
+            decision = False
+            while self.events and self.events[0][0] == t:
+                _, event_type, index, _ = heapq.heappop(self.events)
+                if event_type == EventType.FLOOR:
+                    decision |= self._on_floor(index, t)
+                elif event_type == EventType.DOORS:
+                    decision |= self._on_doors(index, t)
+                elif index < 0:
+                    self._next_chunk()
+                else:
+                    self._on_arrival(t)
+                    decision = True
+
+            if decision:
+                self.num_decisions += 1
+                action, _ = controller.predict(self.get_obs(), deterministic=True)
+                for car, target_floor in zip(self.cars, action):
+                    car.target_floor = min(self.num_floors - 1, int(target_floor))
+
+            # cars without a queued event are stopped, they only need one to leave or to pick up new passengers
+            for car_idx, car in enumerate(self.cars):
+                if not car.has_event and (car.target_floor != car.floor or self.waiting[car.floor]):
+                    self._schedule_car(car_idx, t + 1)
+        self.t = end
+
+    def stats(self) -> dict:
+        """Per passenger wait (request to boarding) and ride (boarding to release) times of delivered passengers"""
+        wait_times = np.array(self.wait_times, dtype=np.float64)
+        ride_times = np.array(self.ride_times, dtype=np.float64)
+        waiting = sum(len(requests) for requests in self.waiting)
+        riding = sum(car.num_passengers for car in self.cars)
+
+        # reward ElevatorV7Env would have given over the simulated timesteps: -1 per timestep spent waiting or riding,
+        # not counting the timestep of the request (it arrives after the reward is computed) or of the release
+        time_in_system = wait_times.sum() + ride_times.sum() - len(wait_times)
+        for requests in self.waiting:
+            time_in_system += sum(self.t - 1 - time_requested for time_requested, _ in requests)
+        for car in self.cars:
+            for requests in car.passengers:
+                time_in_system += sum(self.t - 1 - time_requested for time_requested, _ in requests)
+
+        return {
+            "timesteps": self.t,
+            "num_requests": self.num_total_requests,
+            "num_delivered": len(wait_times),
+            "num_waiting": waiting,
+            "num_riding": riding,
+            "mean_wait": wait_times.mean() if len(wait_times) else 0.0,
+            "p95_wait": np.percentile(wait_times, 95) if len(wait_times) else 0.0,
+            "max_wait": wait_times.max() if len(wait_times) else 0.0,
+            "mean_ride": ride_times.mean() if len(ride_times) else 0.0,
+            "mean_time_in_system": (wait_times + ride_times).mean() if len(wait_times) else 0.0,
+            "reward": -float(time_in_system),
+            "num_decisions": self.num_decisions,
+            "num_events": self.num_events,
+        }
@@ -0,0 +1,194 @@
+from typing import Sequence
+
+import numpy as np
+
+from .arrivals import UniformArrivals
+from .elevator_base_v2 import ElevatorState
+from .encoders import FeatureEncoder, view_observation
+
+REWARD_PER_TIMESTEP = -1
+REWARD_PER_SUCCESS = 0
+
+"""
+ElevatorV7Env dynamics for a portfolio of buildings of different sizes and traffic, stepped together.
+
+Buildings are padded to the largest number of floors and elevators and stored as numpy arrays (as in
+ElevatorV7VecEnv); elevator_mask and floor_mask mark the elevators and floors that exist. Padded elevators stay idle at
+the ground floor without picking up passengers, and no request starts or ends on a padded floor, so every building
+behaves exactly like its own ElevatorV7Env.
+"""
+
+
+class ElevatorFleetSim:
+    def __init__(self, num_floors: Sequence[int], num_elevators: Sequence[int], arrivals=None, request_prob: float | Sequence[float] = 0.3, episode_len: int = 200, random_seed: int = 0):
+        self.num_buildings = len(num_floors)
+        self.num_floors = np.asarray(num_floors, dtype=np.int64)
+        self.num_elevators = np.asarray(num_elevators, dtype=np.int64)
+        if self.num_floors.min() < 2 or self.num_elevators.min() < 1 or len(self.num_elevators) != self.num_buildings:
+            raise ValueError("every building needs at least 2 floors and 1 elevator")
+        self.num_floors_end = int(self.num_floors.max())
+        self.num_elevators_end = int(self.num_elevators.max())
+        self.episode_len = episode_len
+
+        # arrival source of each building: one for all, one per building, or uniform arrivals with per-building probabilities
+        if arrivals is None:
+            arrivals = [UniformArrivals(float(p)) for p in np.broadcast_to(request_prob, (self.num_buildings,))]
+        elif not isinstance(arrivals, (list, tuple)):
+            arrivals = [arrivals] * self.num_buildings
+        self.arrivals = list(arrivals)
+
+        self.elevator_mask = np.arange(self.num_elevators_end) < self.num_elevators[:, None]
+        self.floor_mask = np.arange(self.num_floors_end) < self.num_floors[:, None]
+
+        # observations of every building in the ElevatorV7Env layout of the largest building
+        encoder = FeatureEncoder(self.num_elevators_end, self.num_floors_end)
+        self.observation_layout = encoder.layout()
+        self._obs = np.zeros((self.num_buildings, len(encoder.nvec)), dtype=np.int64)
+        self._fields = view_observation(self._obs, self.observation_layout)
+        self._fields["num_elevators"] = self.num_elevators
+        self._fields["num_floors"] = self.num_floors
+
+        self.rng = np.random.default_rng(random_seed)
+        self._init_state()
+
+    def _init_state(self):
+        n, e, f = self.num_buildings, self.num_elevators_end, self.num_floors_end
+
+        # per elevator state, all elevators at ground
+        self.floor = np.zeros((n, e), dtype=np.int64)
+        self.target_floor = np.zeros((n, e), dtype=np.int64)
+        self.state = np.full((n, e), ElevatorState.IDLE, dtype=np.int64)
+        self.prev_elev_direction = np.where(self.elevator_mask, ElevatorState.IDLE, 0)
+
+        # passenger counts: car_calls[building, elevator, target floor], hall_calls[building, start floor, target floor],
+        # with the sums of the times they were requested (waiting) or boarded (riding)
+        self.car_calls = np.zeros((n, e, f), dtype=np.int64)
+        self.car_board_time_sum = np.zeros((n, e, f), dtype=np.int64)
+        self.hall_calls = np.zeros((n, f, f), dtype=np.int64)
+        self.hall_time_sum = np.zeros((n, f), dtype=np.int64)
+        self.num_up_waiting = np.zeros((n, f), dtype=np.int64)
+        self.num_down_waiting = np.zeros((n, f), dtype=np.int64)
+
+        self.num_riding = np.zeros((n, e), dtype=np.int64)
+        self.num_waiting = np.zeros(n, dtype=np.int64)
+
+        self.t = 0
+
+        self.num_dropped_off = np.zeros(n, dtype=np.int64)
+        self.num_total_requests = np.zeros(n, dtype=np.int64)
+        self.num_boarded = np.zeros(n, dtype=np.int64)
+        self.wait_time_sum = np.zeros(n, dtype=np.int64)
+        self.ride_time_sum = np.zeros(n, dtype=np.int64)
+        self.episode_rew = np.zeros(n, dtype=np.int64)
+
+        # the episode's arrivals of all buildings, ordered by time: those of step t are [offsets[t], offsets[t + 1])
+        streams = [self.arrivals[b].sample(self.rng, int(self.num_floors[b]), self.episode_len + 1) for b in range(n)]
+        times = np.concatenate([stream.times for stream in streams])
+        order = np.argsort(times, kind="stable")
+        self._arrival_building = np.repeat(np.arange(n), [len(stream) for stream in streams])[order]
+        self._arrival_start = np.concatenate([stream.starting_floors for stream in streams])[order]
+        self._arrival_target = np.concatenate([stream.target_floors for stream in streams])[order]
+        self._arrival_offsets = np.searchsorted(times[order], np.arange(self.episode_len + 2))
+
+    def reset(self) -> np.ndarray:
+        self._init_state()
+        return self.get_obs()
+
+    def get_obs(self) -> np.ndarray:
+        """(num_buildings, obs size) observations, see observation_layout"""
+        elevators = self._fields["elevators"]
+        elevators["floor"] = self.floor
+        elevators["target"] = self.target_floor
+        elevators["prev_direction"] = self.prev_elev_direction
+        elevators["direction"] = self.state
+        np.greater(self.car_calls, 0, out=elevators["buttons"])
+        np.greater(self.num_up_waiting, 0, out=self._fields["up"])
+        np.greater(self.num_down_waiting, 0, out=self._fields["down"])
+        return self._obs.copy()
+
+    def step(self, actions: np.ndarray):
+        """actions: (num_buildings, num_elevators_end) target floors; returns (obs, rewards, done, info)"""
+        t = self.t
+        rows_all = np.arange(self.num_buildings)
+
+        # handle action, padded elevators stay at the ground floor
+        np.minimum(actions, self.num_floors[:, None] - 1, out=self.target_floor)
+        self.target_floor *= self.elevator_mask
+
+        num_released = np.zeros(self.num_buildings, dtype=np.int64)
+        for e in range(self.num_elevators_end):
+            np.multiply(self.state[:, e], self.elevator_mask[:, e], out=self.prev_elev_direction[:, e])
+
+            # ElevatorBaseV2.update_state: move one floor towards the target, idle once it is reached
+            self.floor[:, e] += np.sign(self.target_floor[:, e] - self.floor[:, e])
+            self.state[:, e] = np.sign(self.target_floor[:, e] - self.floor[:, e]) + 1
+
+            rows = rows_all[(self.state[:, e] == ElevatorState.IDLE) & self.elevator_mask[:, e]]
+            if rows.size == 0:
+                continue
+            floors = self.floor[rows, e]
+
+            # release passengers
+            released = self.car_calls[rows, e, floors]
+            self.ride_time_sum[rows] += released * t - self.car_board_time_sum[rows, e, floors]
+            self.car_calls[rows, e, floors] = 0
+            self.car_board_time_sum[rows, e, floors] = 0
+            self.num_riding[rows, e] -= released
+            num_released[rows] += released
+
+            # add waiting passengers
+            boarding = self.num_up_waiting[rows, floors] + self.num_down_waiting[rows, floors]
+            self.wait_time_sum[rows] += boarding * t - self.hall_time_sum[rows, floors]
+            self.car_calls[rows, e] += self.hall_calls[rows, floors]
+            self.car_board_time_sum[rows, e] += self.hall_calls[rows, floors] * t
+            self.hall_calls[rows, floors] = 0
+            self.hall_time_sum[rows, floors] = 0
+            self.num_up_waiting[rows, floors] = 0
+            self.num_down_waiting[rows, floors] = 0
+            self.num_riding[rows, e] += boarding
+            self.num_waiting[rows] -= boarding
+            self.num_boarded[rows] += boarding
+
+        self.num_dropped_off += num_released
+        reward = REWARD_PER_SUCCESS * num_released + REWARD_PER_TIMESTEP * (self.num_riding.sum(axis=1) + self.num_waiting)
+
+        # add new requests (several per building and floor are possible, hence np.add.at)
+        arrivals = slice(self._arrival_offsets[t], self._arrival_offsets[t + 1])
+        building = self._arrival_building[arrivals]
+        start = self._arrival_start[arrivals]
+        target = self._arrival_target[arrivals]
+        going_up = target > start
+        np.add.at(self.hall_calls, (building, start, target), 1)
+        np.add.at(self.hall_time_sum, (building, start), t)
+        np.add.at(self.num_up_waiting, (building[going_up], start[going_up]), 1)
+        np.add.at(self.num_down_waiting, (building[~going_up], start[~going_up]), 1)
+        np.add.at(self.num_waiting, building, 1)
+        np.add.at(self.num_total_requests, building, 1)
+
+        self.t += 1
+        self.episode_rew += reward
+
+        return self.get_obs(), reward, self.t > self.episode_len, {}
+
+    def run(self, controller) -> dict:
+        """Simulates an episode of every building with controller.predict on the batch of observations, returns stats()"""
+        obs = self.reset()
+        done = False
+        while not done:
+            actions, _ = controller.predict(obs, deterministic=True)
+            obs, _, done, _ = self.step(np.asarray(actions, dtype=np.int64))
+        return self.stats()
+
+    def stats(self) -> dict:
+        """Per-building arrays: request counts, mean wait (request to boarding) and ride (boarding to release) times, reward"""
+        return {
+            "num_floors": self.num_floors,
+            "num_elevators": self.num_elevators,
+            "num_requests": self.num_total_requests.copy(),
+            "num_delivered": self.num_dropped_off.copy(),
+            "num_waiting": self.num_waiting.copy(),
+            "num_riding": self.num_riding.sum(axis=1),
+            "mean_wait": self.wait_time_sum / np.maximum(self.num_boarded, 1),
+            "mean_ride": self.ride_time_sum / np.maximum(self.num_dropped_off, 1),
+            "reward": self.episode_rew.copy(),
+        }
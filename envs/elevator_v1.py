@@ -2,6 +2,7 @@ import gym
 from gym import spaces
 import numpy as np
 
+from .arrivals import UniformArrivals
 from .elevator_base import Elevator, ElevatorState, Request, TIME_PER_FLOOR
 
 MAX_PEOPLE = 50
@@ -13,7 +14,7 @@ REWARD_PER_SUCCESS = 0
 class ElevatorV1Env(gym.Env):
     metadata = {"render.modes": ["human"], "video.frames_per_second": 15}
 
-    def __init__(self, num_elevators: int = 1, num_floors: int = 3, episode_len: int = 200):
+    def __init__(self, num_elevators: int = 1, num_floors: int = 3, episode_len: int = 200, random_seed: int | None = None, arrivals=None):
         self.num_elevators: int = num_elevators
         self.num_floors: int = num_floors
         self.episode_len: int = episode_len
@@ -43,8 +44,11 @@ class ElevatorV1Env(gym.Env):
             [self.num_floors for _ in range(self.num_elevators)]  # target floor for each elevator
         )
 
+        # source of each episode's arrival stream (UniformArrivals, PoissonArrivals, ...)
+        self.arrivals = arrivals if arrivals is not None else UniformArrivals(0.3)
+
+        self.rng = np.random.default_rng(random_seed)
         self._init_state()
-        self.rng = np.random.default_rng()
 
     def _init_state(self):
         self.elevators: list[Elevator] = [Elevator(0, 0, self.num_floors) for _ in range(self.num_elevators)]  # all elevators at ground
@@ -52,6 +56,9 @@ class ElevatorV1Env(gym.Env):
 
         self.t = 0
 
+        # draw the whole episode's arrivals at once, step consumes them with a cursor
+        self.arrival_stream = self.arrivals.sample(self.rng, self.num_floors, self.episode_len + 1)
+
         self.num_dropped_off = 0
         self.num_total_requests = 0
 
@@ -68,10 +75,10 @@ class ElevatorV1Env(gym.Env):
             obs.append(self.elevators[i].time_to_next_floor)  # time to next floor
             obs.append(self.elevators[i].state)  # direction
             for j in range(self.num_floors):
-                obs.append(len(self.elevators[i].requests.get(j, [])))  # num people in the elevator requesting each floor
+                obs.append(min(len(self.elevators[i].requests.get(j, [])), MAX_PEOPLE - 1))  # num people in the elevator requesting each floor (saturates)
 
         for i in range(self.num_floors):
-            obs.append(len(self.unassigned_requests.get(i, [])))  # num people waiting on each floor
+            obs.append(min(len(self.unassigned_requests.get(i, [])), MAX_PEOPLE - 1))  # num people waiting on each floor (saturates)
 
         # print(f"{obs=}")
         # print(f"{self.observation_space=}")
@@ -118,12 +125,7 @@ class ElevatorV1Env(gym.Env):
             reward += REWARD_PER_TIMESTEP * len(requests_list)
 
         # add new requests
-        if self.rng.random() < 0.3:
-            starting_floor = self.rng.integers(self.num_floors)
-            target_floor = self.rng.integers(self.num_floors - 1)
-            if target_floor >= starting_floor:
-                target_floor += 1
-
+        for starting_floor, target_floor in self.arrival_stream.pop(self.t):
             self.unassigned_requests[starting_floor].append(Request(self.t, target_floor))
             self.num_total_requests += 1
 
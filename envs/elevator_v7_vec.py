@@ -0,0 +1,308 @@
+from typing import Any, Optional
+
+from gym import spaces
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from .arrivals import UniformArrivals
+from .elevator_base_v2 import ElevatorState
+from .encoders import FeatureEncoder, compact_dtype
+from .profiling import StepProfiler
+
+REWARD_PER_TIMESTEP = -1
+REWARD_PER_SUCCESS = 0
+
+"""
+Batched ElevatorV7Env: N buildings stored as numpy arrays (struct of arrays) and stepped together as an SB3 VecEnv.
+"""
+class ElevatorV7VecEnv(VecEnv):
+    """
+    Building i has the observations, rewards and arrivals of ElevatorV7Env(random_seed=random_seed + i) under
+    DummyVecEnv, for the same actions. The buildings share one curriculum, whose history holds the episodes of all of
+    them (the same as ElevatorV7Env's with a single building).
+    """
+    metadata = {"render.modes": []}
+    ENV_METHODS = ("action_masks", "seed", "reset")  # what env_method supports
+
+    def __init__(self, num_envs: int = 8, num_elevators_start: int = 1, num_floors_start: int = 3, curriculum: bool = False, num_elevators_end: int = -1, num_floors_end: int = -1, episode_len: int = 200, random_seed: int = 0, request_prob: float = 0.3, arrivals=None, compact_obs: bool = False, profile: bool = False):
+        self.num_elevators: int = num_elevators_start
+        self.num_floors: int = num_floors_start
+        self.curriculum = curriculum
+
+        self.num_floors_start = num_floors_start
+        self.num_elevators_start = num_elevators_start
+        self.num_elevators_end = num_elevators_end if self.curriculum else self.num_elevators_start
+        self.num_floors_end = num_floors_end if self.curriculum else self.num_floors_start
+
+        self.episode_len: int = episode_len
+
+        # same layout as ElevatorV7Env: [num elevators, num floors, (floor, target, prev direction, direction, floor buttons) per elevator, up buttons, down buttons]
+        self.elev_obs_len = 4 + self.num_floors_end
+        self.up_offset = 2 + self.num_elevators_end * self.elev_obs_len
+        self.down_offset = self.up_offset + self.num_floors_end
+
+        obs_space = [self.num_elevators_end + 1, self.num_floors_end + 1]
+        for _ in range(self.num_elevators_end):
+            obs_space += [self.num_floors_end, self.num_floors_end, 3, 3] + [2] * self.num_floors_end
+        obs_space += [2] * (2 * self.num_floors_end)
+        observation_space = spaces.MultiDiscrete(obs_space, dtype=compact_dtype(obs_space) if compact_obs else np.int64)
+        action_space = spaces.MultiDiscrete([self.num_floors_end for _ in range(self.num_elevators_end)])
+
+        super().__init__(num_envs, observation_space, action_space)
+        self.observation_layout = FeatureEncoder(self.num_elevators_end, self.num_floors_end).layout(observation_space.dtype)
+
+        self.request_prob = request_prob
+        self.override_curriculum = False
+
+        # source of each episode's arrival stream of every building (UniformArrivals, ReplayArrivals, ...), drawn with
+        # the building's own rng as ElevatorV7Env does
+        self.arrivals = arrivals if arrivals is not None else UniformArrivals(request_prob)
+        self.rngs = [np.random.default_rng(random_seed + i) for i in range(num_envs)]
+        self._actions: Optional[np.ndarray] = None
+
+        # time the phases of step_wait (laps of the StepProfiler), as ElevatorV7Env(profile=True)
+        self.profiler = StepProfiler() if profile else None
+        if self.profiler is not None:
+            self.profiler.instrument(self, "step_wait", "step")
+            self.profiler.instrument(self, "reset")
+
+        self._init_state()
+        self._reset_history()
+
+    def _init_state(self):
+        n, e, f = self.num_envs, self.num_elevators_end, self.num_floors_end
+
+        # per elevator state, all elevators at ground
+        self.floor = np.zeros((n, e), dtype=np.int64)
+        self.target_floor = np.zeros((n, e), dtype=np.int64)
+        self.state = np.full((n, e), ElevatorState.IDLE, dtype=np.int64)
+        self.prev_elev_direction = np.full((n, e), ElevatorState.IDLE, dtype=np.int64)
+
+        # passenger counts: car_calls[env, elevator, target floor], hall_calls[env, start floor, target floor]
+        self.car_calls = np.zeros((n, e, f), dtype=np.int64)
+        self.hall_calls = np.zeros((n, f, f), dtype=np.int64)
+        self.num_up_waiting = np.zeros((n, f), dtype=np.int64)
+        self.num_down_waiting = np.zeros((n, f), dtype=np.int64)
+
+        # running totals so that the reward does not need to sum the count arrays
+        self.num_riding = np.zeros((n, e), dtype=np.int64)
+        self.num_waiting = np.zeros(n, dtype=np.int64)
+
+        self.t = 0
+        self.total_t = 0
+
+        self.num_dropped_off = np.zeros(n, dtype=np.int64)
+        self.num_total_requests = np.zeros(n, dtype=np.int64)
+        self.episode_rew = np.zeros(n, dtype=np.int64)
+
+        # the whole episode's arrivals of every building, sorted by time (then building), consumed with a cursor
+        streams = [self.arrivals.sample(rng, self.num_floors, self.episode_len + 1) for rng in self.rngs]
+        times = np.concatenate([stream.times for stream in streams])
+        order = np.argsort(times, kind="stable")
+        self.arrival_times = times[order]
+        self.arrival_rows = np.repeat(np.arange(n), [len(stream) for stream in streams])[order]
+        self.arrival_starting_floors = np.concatenate([stream.starting_floors for stream in streams])[order]
+        self.arrival_target_floors = np.concatenate([stream.target_floors for stream in streams])[order]
+        self.arrival_cursor = 0
+
+        self._obs = np.zeros((n, self.observation_space.shape[0]), dtype=self.observation_space.dtype)
+        self._elev_obs = self._obs[:, 2:self.up_offset].reshape(n, e, self.elev_obs_len)
+
+    def _reset_history(self):
+        self.history_len = 10
+        self.dropped_off_history = []
+        self.requests_history = []
+        self.reward_history = []
+
+    def _update_curriculum(self):
+        if self.num_elevators < self.num_elevators_end and (self.num_floors - self.num_floors_start) / (self.num_floors_end - self.num_floors_start) >= (self.num_elevators + 1 - self.num_elevators_start) / (self.num_elevators_end - self.num_elevators_start):
+            print(f"Updating curriculum: num_elevators {self.num_elevators} -> {self.num_elevators + 1}")
+            self.num_elevators += 1
+            self._reset_history()
+        elif self.num_floors < self.num_floors_end:
+            print(f"Updating curriculum: num_floors {self.num_floors} -> {self.num_floors + 1}")
+            self.num_floors += 1
+            self._reset_history()
+
+    def _end_episodes(self):
+        # every env has the same episode length, so all of them finish on the same step
+        self.dropped_off_history = (self.dropped_off_history + self.num_dropped_off.tolist())[-self.history_len:]
+        self.requests_history = (self.requests_history + self.num_total_requests.tolist())[-self.history_len:]
+        self.reward_history = (self.reward_history + self.episode_rew.tolist())[-self.history_len:]
+
+        threshold = -80 - 50 * (self.num_floors - 3)
+        if not self.override_curriculum and len(self.reward_history) >= self.history_len and sum(self.reward_history) / self.history_len > threshold:
+            self._update_curriculum()
+
+        self._init_state()
+
+    def reset(self, override_curriculum=False):
+        # as ElevatorV7Env.reset, the episodes in progress go to the curriculum history
+        self.override_curriculum = override_curriculum
+        self._end_episodes()
+        return self.get_obs()
+
+    def get_obs(self):
+        ne, nf = self.num_elevators, self.num_floors
+        obs = self._obs
+        elev_obs = self._elev_obs
+
+        obs[:, 0] = ne
+        obs[:, 1] = nf
+        elev_obs[:, :ne, 0] = self.floor[:, :ne]
+        elev_obs[:, :ne, 1] = self.target_floor[:, :ne]
+        elev_obs[:, :ne, 2] = self.prev_elev_direction[:, :ne]
+        elev_obs[:, :ne, 3] = self.state[:, :ne]
+        np.greater(self.car_calls[:, :ne], 0, out=elev_obs[:, :ne, 4:])
+
+        # fill in rest of elevators
+        elev_obs[:, ne:, :] = 0
+        elev_obs[:, ne:, 3] = ElevatorState.IDLE
+
+        np.greater(self.num_up_waiting, 0, out=obs[:, self.up_offset:self.down_offset])
+        np.greater(self.num_down_waiting, 0, out=obs[:, self.down_offset:])
+
+        return obs.copy()
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = np.asarray(actions).reshape(self.num_envs, self.num_elevators_end)
+
+    def step_wait(self):
+        ne, nf = self.num_elevators, self.num_floors
+        rows_all = np.arange(self.num_envs)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+
+        # handle action
+        np.minimum(self._actions[:, :ne], nf - 1, out=self.target_floor[:, :ne])
+        if profiler is not None:
+            profiler.lap("apply_action")
+
+        # update elevators, calculate reward
+        num_released = np.zeros(self.num_envs, dtype=np.int64)
+        for e in range(ne):
+            self.prev_elev_direction[:, e] = self.state[:, e]
+
+            # ElevatorBaseV2.update_state: move one floor towards the target, idle once it is reached
+            self.floor[:, e] += np.sign(self.target_floor[:, e] - self.floor[:, e])
+            self.state[:, e] = np.sign(self.target_floor[:, e] - self.floor[:, e]) + 1
+
+            rows = rows_all[self.state[:, e] == ElevatorState.IDLE]
+            if profiler is not None:
+                profiler.lap("update_state")
+            if rows.size == 0:
+                continue
+            floors = self.floor[rows, e]
+
+            # release passengers
+            released = self.car_calls[rows, e, floors]
+            self.car_calls[rows, e, floors] = 0
+            self.num_riding[rows, e] -= released
+            num_released[rows] += released
+            if profiler is not None:
+                profiler.lap("alight")
+
+            # add waiting passengers
+            boarding = self.num_up_waiting[rows, floors] + self.num_down_waiting[rows, floors]
+            self.car_calls[rows, e] += self.hall_calls[rows, floors]
+            self.hall_calls[rows, floors] = 0
+            self.num_up_waiting[rows, floors] = 0
+            self.num_down_waiting[rows, floors] = 0
+            self.num_riding[rows, e] += boarding
+            self.num_waiting[rows] -= boarding
+            if profiler is not None:
+                profiler.lap("board")
+
+        self.num_dropped_off += num_released
+        reward = REWARD_PER_SUCCESS * num_released + REWARD_PER_TIMESTEP * (self.num_riding[:, :ne].sum(axis=1) + self.num_waiting)
+        if profiler is not None:
+            profiler.lap("reward")
+
+        # add new requests (several per building and floor with PoissonArrivals, hence add.at)
+        start = self.arrival_cursor
+        self.arrival_cursor = end = int(np.searchsorted(self.arrival_times, self.t, side="right"))
+        if end > start:
+            rows = self.arrival_rows[start:end]
+            starting_floor = self.arrival_starting_floors[start:end]
+            target_floor = self.arrival_target_floors[start:end]
+
+            np.add.at(self.hall_calls, (rows, starting_floor, target_floor), 1)
+            going_up = target_floor > starting_floor
+            np.add.at(self.num_up_waiting, (rows[going_up], starting_floor[going_up]), 1)
+            np.add.at(self.num_down_waiting, (rows[~going_up], starting_floor[~going_up]), 1)
+            np.add.at(self.num_waiting, rows, 1)
+            np.add.at(self.num_total_requests, rows, 1)
+        if profiler is not None:
+            profiler.lap("arrivals")
+
+        self.t += 1
+        self.total_t += 1
+
+        self.episode_rew += reward
+
+        obs = self.get_obs()
+        if profiler is not None:
+            profiler.lap("get_obs")
+        done = self.t > self.episode_len
+        dones = np.full(self.num_envs, done)
+        infos = [{} for _ in range(self.num_envs)]
+        if done:
+            for env_idx in range(self.num_envs):
+                infos[env_idx]["terminal_observation"] = obs[env_idx]
+            self._end_episodes()
+            obs = self.get_obs()
+            if profiler is not None:
+                profiler.lap("end_episodes")
+
+        return obs, reward.astype(np.float32), dones, infos
+
+    def action_masks(self) -> np.ndarray:
+        """Valid target floors of every building's elevators at the current curriculum stage, as ElevatorV7Env.action_masks"""
+        mask = np.zeros((self.num_envs, self.num_elevators_end, self.num_floors_end), dtype=bool)
+        mask[:, : self.num_elevators, : self.num_floors] = True
+        mask[:, self.num_elevators :, 0] = True
+        return mask.reshape(self.num_envs, -1)
+
+    def close(self):
+        pass
+
+    def seed(self, seed: Optional[int] = None):
+        # building i gets seed + i, as the envs of make_vec_env
+        self.rngs = [np.random.default_rng(None if seed is None else seed + i) for i in range(self.num_envs)]
+        return [None if seed is None else seed + i for i in range(self.num_envs)]
+
+    def _indices(self, indices) -> list[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def get_attr(self, attr_name: str, indices=None) -> list[Any]:
+        # all buildings share the curriculum and the env parameters
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list[Any]:
+        """
+        There are no sub-environments: the methods of ENV_METHODS run on the batch and return one result per env of
+        indices. seed reseeds every building (with seed + i), reset needs every env (they share the episode clock).
+        """
+        env_indices = self._indices(indices)
+        if method_name == "action_masks":
+            # how MaskablePPO gets the masks of a VecEnv
+            return list(self.action_masks()[env_indices])
+        if method_name == "seed":
+            seeds = self.seed(*method_args, **method_kwargs)
+            return [seeds[i] for i in env_indices]
+        if method_name == "reset":
+            if sorted(env_indices) != list(range(self.num_envs)):
+                raise ValueError("ElevatorV7VecEnv can only reset all its envs at once")
+            return list(self.reset(*method_args, **method_kwargs)[env_indices])
+        raise AttributeError(f"ElevatorV7VecEnv simulates its envs as one batch, env_method supports {', '.join(self.ENV_METHODS)}, not {method_name!r}")
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list[bool]:
+        return [False for _ in self._indices(indices)]
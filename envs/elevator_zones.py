@@ -0,0 +1,269 @@
+import multiprocessing as mp
+import threading
+import traceback
+from typing import Sequence
+
+import numpy as np
+
+from .arrivals import ArrivalStream, NoArrivals, ReplayArrivals, UniformArrivals
+from .elevator_base import ElevatorState
+from .elevator_v7 import ElevatorV7Env
+
+"""
+Zone-sharded simulation of one tall building served by several banks of elevators (low-rise, mid-rise, high-rise, ...).
+
+Every bank (zone) is an ElevatorV7Env of its own cars that only gets the requests between floors it serves. A request
+between floors of different zones rides the first zone to a transfer floor both zones serve (the lobby, a sky lobby)
+and is handed over to the second zone there, as a new request at the timestep it gets off. Zones run in lockstep, each
+in its own worker process, and only exchange the transferring passengers at tick boundaries, through shared-memory
+buffers.
+"""
+
+TRANSFER_FIELDS = 4  # destination zone, transfer floor, target floor, timestep
+ZONE_FAILED = "stopped, another zone failed"
+
+
+class ZoneShard:
+    """
+    One zone: an ElevatorV7Env over floors 0 to the highest floor the zone serves (cars pass the floors they do not
+    serve, as express cars do), its controller, and the final targets of its passengers that transfer to another zone.
+    """
+
+    def __init__(self, zone_idx: int, num_floors: int, num_elevators: int, episode_len: int, controller_class):
+        self.zone_idx = zone_idx
+        self.env = ElevatorV7Env(num_elevators_start=num_elevators, num_floors_start=num_floors, episode_len=episode_len, pooled=True, arrivals=NoArrivals())
+        self.controller = controller_class(self.env)
+
+    def start_episode(self, stream: ArrivalStream, transfers: dict[int, tuple[int, int]]):
+        """stream: the zone's arrivals, transfers[k]: (destination zone, final target) of arrival k when it continues past its target"""
+        self.env.arrivals = ReplayArrivals([stream])
+        self.obs = self.env.reset(override_curriculum=True)
+        self.transfers = transfers
+        self.waiting: dict[int, list[tuple[int, int, int]]] = {}  # floor: (transfer floor, destination zone, final target)
+        self.riding: list[dict[int, list[tuple[int, int]]]] = [{} for _ in self.env.elevators]  # transfer floor: (destination zone, final target)
+        self.num_transfers_out = 0
+        self.num_transfers_in = 0
+
+    def add_transfers(self, transfers: np.ndarray):
+        """Passengers handed over by other zones, rows of TRANSFER_FIELDS"""
+        env = self.env
+        for _, floor, target_floor, t in transfers.tolist():
+            env.add_request(floor, target_floor, t)
+        self.num_transfers_in += len(transfers)
+
+    def tick(self, t: int) -> list[tuple[int, int, int, int]]:
+        """Steps the zone's env once, returns the passengers that got off at a transfer floor this timestep"""
+        env = self.env
+        stream = env.arrival_stream
+        cursor = stream.cursor
+        action, _ = self.controller.predict(self.obs, deterministic=True)
+        self.obs, _, _, _ = env.step(action)
+
+        # follow the transferring passengers as step does: an idle car releases the passengers to its floor, then
+        # boards everyone waiting there
+        transfers = []
+        for elev_idx, elevator in enumerate(env.elevators):
+            if elevator.state != ElevatorState.IDLE:
+                continue
+            riding = self.riding[elev_idx]
+            if elevator.floor in riding:
+                transfers.extend((zone, elevator.floor, target_floor, t) for zone, target_floor in riding.pop(elevator.floor))
+            for transfer_floor, zone, target_floor in self.waiting.pop(elevator.floor, ()):
+                riding.setdefault(transfer_floor, []).append((zone, target_floor))
+
+        # this timestep's arrivals come after the elevators
+        for k in range(cursor, stream.cursor):
+            if k in self.transfers:
+                self.waiting.setdefault(int(stream.starting_floors[k]), []).append((int(stream.target_floors[k]), *self.transfers[k]))
+        self.num_transfers_out += len(transfers)
+        return transfers
+
+    def stats(self) -> dict:
+        env = self.env
+        return {
+            "num_requests": env.num_total_requests,
+            "num_delivered": env.num_dropped_off,
+            "num_transfers_in": self.num_transfers_in,
+            "num_transfers_out": self.num_transfers_out,
+            "num_waiting": env.num_waiting,
+            "num_riding": env.num_riding,
+            "reward": env.episode_rew,
+        }
+
+
+def _zone_worker(conn, barrier, outbox_buffer, counts_buffer, num_zones: int, capacity: int, zone_idx: int, num_floors: int, num_elevators: int, episode_len: int, controller_class):
+    outbox = np.frombuffer(outbox_buffer, dtype=np.int64).reshape(num_zones, 2, capacity, TRANSFER_FIELDS)
+    counts = np.frombuffer(counts_buffer, dtype=np.int64).reshape(num_zones, 2)
+    shard = ZoneShard(zone_idx, num_floors, num_elevators, episode_len, controller_class)
+    while True:
+        command, data = conn.recv()
+        if command == "close":
+            break
+        try:
+            shard.start_episode(*data)
+            for t in range(episode_len + 1):
+                if t > 0:
+                    # transfers of the previous tick; the outboxes alternate by tick, so that a zone can write the
+                    # current tick's while the others still read the previous one's
+                    side = (t - 1) % 2
+                    for zone in range(num_zones):
+                        rows = outbox[zone, side, : counts[zone, side]]
+                        rows = rows[rows[:, 0] == zone_idx]
+                        if len(rows):
+                            shard.add_transfers(rows)
+                transfers = shard.tick(t)
+                if len(transfers) > capacity:
+                    raise RuntimeError(f"zone {zone_idx} handed over {len(transfers)} passengers in one timestep, more than transfer_capacity={capacity}")
+                if transfers:
+                    outbox[zone_idx, t % 2, : len(transfers)] = transfers
+                counts[zone_idx, t % 2] = len(transfers)
+                barrier.wait()
+            conn.send(("ok", shard.stats()))
+        except threading.BrokenBarrierError:
+            conn.send(("error", ZONE_FAILED))
+        except Exception:
+            barrier.abort()
+            conn.send(("error", traceback.format_exc()))
+
+
+class ZonedElevatorSim:
+    """
+    zones: (floors served, number of cars) of every zone, e.g. ZonedElevatorSim.skyscraper for the classic layout where
+    every zone serves the lobby and a range of consecutive floors. Every floor must be served, and any two floors must
+    be connected by one zone or by two zones with a common (transfer) floor.
+
+    controller_class is called with each zone's env, in the zone's process (StandardElevatorV7Controller, ...).
+    With processes=False the zones run one after another in this process, with the same results.
+    """
+
+    def __init__(self, zones: Sequence[tuple[Sequence[int], int]], controller_class, arrivals=None, request_prob: float = 0.3, episode_len: int = 200, random_seed: int = 0, processes: bool = True, transfer_capacity: int = 1024):
+        self.zones = [(sorted(set(floors)), num_elevators) for floors, num_elevators in zones]
+        self.num_zones = len(self.zones)
+        self.num_floors = max(floors[-1] for floors, _ in self.zones) + 1
+        self.num_elevators = sum(num_elevators for _, num_elevators in self.zones)
+        self.episode_len = episode_len
+        self.arrivals = arrivals if arrivals is not None else UniformArrivals(request_prob)
+        self.rng = np.random.default_rng(random_seed)
+        self.route = self._build_routes()
+
+        self._stats = None
+        self.processes = processes
+        zone_args = [(zone_idx, floors[-1] + 1, num_elevators, episode_len, controller_class) for zone_idx, (floors, num_elevators) in enumerate(self.zones)]
+        if not processes:
+            self.shards = [ZoneShard(*args) for args in zone_args]
+            return
+
+        ctx = mp.get_context()
+        self.barrier = ctx.Barrier(self.num_zones)
+        self.outbox_buffer = ctx.RawArray("q", self.num_zones * 2 * transfer_capacity * TRANSFER_FIELDS)
+        self.counts_buffer = ctx.RawArray("q", self.num_zones * 2)
+        self.conns = []
+        self.workers = []
+        for args in zone_args:
+            conn, worker_conn = ctx.Pipe()
+            worker = ctx.Process(target=_zone_worker, args=(worker_conn, self.barrier, self.outbox_buffer, self.counts_buffer, self.num_zones, transfer_capacity, *args), daemon=True)
+            worker.start()
+            worker_conn.close()
+            self.conns.append(conn)
+            self.workers.append(worker)
+
+    @classmethod
+    def skyscraper(cls, num_floors: int, num_elevators: int, num_zones: int, controller_class, **kwargs) -> "ZonedElevatorSim":
+        """num_zones zones of consecutive floors above the lobby (floor 0), which every zone serves, cars split evenly"""
+        bounds = np.linspace(1, num_floors, num_zones + 1).round().astype(int)
+        cars = np.diff(np.linspace(0, num_elevators, num_zones + 1).round().astype(int))
+        zones = [([0, *range(bounds[z], bounds[z + 1])], int(cars[z])) for z in range(num_zones)]
+        return cls(zones, controller_class, **kwargs)
+
+    def _build_routes(self) -> np.ndarray:
+        """route[start, target]: (first zone, transfer floor or -1 when the first zone serves the target, second zone)"""
+        served = [set(floors) for floors, _ in self.zones]
+        missing = set(range(self.num_floors)).difference(*served)
+        if missing:
+            raise ValueError(f"floors {sorted(missing)} are not served by any zone")
+        route = np.full((self.num_floors, self.num_floors, 3), -1, dtype=np.int64)
+        for start in range(self.num_floors):
+            for target in range(self.num_floors):
+                direct = [z for z in range(self.num_zones) if start in served[z] and target in served[z]]
+                if direct:
+                    route[start, target] = direct[0], -1, direct[0]
+                    continue
+                # transfer floor with the shortest trip
+                options = [(abs(start - floor) + abs(floor - target), floor, first, second)
+                           for first in range(self.num_zones) if start in served[first]
+                           for second in range(self.num_zones) if target in served[second]
+                           for floor in served[first] & served[second]]
+                if not options:
+                    raise ValueError(f"no zone or pair of zones connects floor {start} to floor {target}")
+                _, floor, first, second = min(options)
+                route[start, target] = first, floor, second
+        return route
+
+    def _zone_episodes(self) -> list[tuple[ArrivalStream, dict[int, tuple[int, int]]]]:
+        """Splits an episode of the building's arrivals into each zone's first legs, with the transfers to follow"""
+        stream = self.arrivals.sample(self.rng, self.num_floors, self.episode_len + 1)
+        first, transfer_floor, second = self.route[stream.starting_floors, stream.target_floors].T
+        transfers = transfer_floor >= 0
+        leg_targets = np.where(transfers, transfer_floor, stream.target_floors)
+        episodes = []
+        for zone in range(self.num_zones):
+            in_zone = first == zone
+            zone_stream = ArrivalStream(stream.times[in_zone], stream.starting_floors[in_zone], leg_targets[in_zone])
+            k = np.flatnonzero(transfers[in_zone])
+            episodes.append((zone_stream, dict(zip(k.tolist(), zip(second[in_zone][k].tolist(), stream.target_floors[in_zone][k].tolist())))))
+        return episodes
+
+    def _run_in_process(self, episodes) -> list[dict]:
+        for shard, episode in zip(self.shards, episodes):
+            shard.start_episode(*episode)
+        pending = np.zeros((0, TRANSFER_FIELDS), dtype=np.int64)
+        for t in range(self.episode_len + 1):
+            transfers = []
+            for shard in self.shards:
+                rows = pending[pending[:, 0] == shard.zone_idx]
+                if len(rows):
+                    shard.add_transfers(rows)
+                transfers.extend(shard.tick(t))
+            pending = np.array(transfers, dtype=np.int64).reshape(-1, TRANSFER_FIELDS)
+        return [shard.stats() for shard in self.shards]
+
+    def _run_in_workers(self, episodes) -> list[dict]:
+        for conn, episode in zip(self.conns, episodes):
+            conn.send(("run", episode))
+        results = [conn.recv() for conn in self.conns]
+        errors = sorted((message for status, message in results if status == "error"), key=lambda message: message == ZONE_FAILED)
+        if errors:
+            self.barrier.reset()
+            raise RuntimeError("zone worker failed:\n" + "\n".join(errors))
+        return [message for _, message in results]
+
+    def run(self) -> dict:
+        """Simulates an episode of the building, returns stats()"""
+        episodes = self._zone_episodes()
+        self._stats = self._run_in_workers(episodes) if self.processes else self._run_in_process(episodes)
+        return self.stats()
+
+    def zone_stats(self) -> dict:
+        """Per-zone arrays of the last episode: requests (including transfers in), deliveries (including transfers out), reward"""
+        return {name: np.array([stats[name] for stats in self._stats]) for name in self._stats[0]}
+
+    def stats(self) -> dict:
+        """Building totals of the last episode: a transferring passenger is one request and one delivery"""
+        zones = self.zone_stats()
+        return {
+            "num_requests": int(zones["num_requests"].sum() - zones["num_transfers_in"].sum()),
+            "num_delivered": int(zones["num_delivered"].sum() - zones["num_transfers_out"].sum()),
+            "num_transfers": int(zones["num_transfers_out"].sum()),
+            "num_waiting": int(zones["num_waiting"].sum() + zones["num_transfers_out"].sum() - zones["num_transfers_in"].sum()),  # with the last timestep's transfers
+            "num_riding": int(zones["num_riding"].sum()),
+            "reward": int(zones["reward"].sum()),
+        }
+
+    def close(self):
+        if self.processes:
+            for conn in self.conns:
+                conn.send(("close", None))
+            for worker in self.workers:
+                worker.join()
+            self.conns = []
+            self.workers = []
@@ -0,0 +1,456 @@
+from gym import spaces
+import numpy as np
+
+from .elevator_base import ElevatorState, TIME_PER_FLOOR
+
+"""
+Observation (and action) encodings of the elevator env versions.
+
+An encoder owns the layout of the observation vector, padded to the final curriculum size, and writes into the env's
+preallocated observation buffer. rebuild writes every slot; the other methods are called by the env's step for the
+parts of the state that just changed, so a step only costs as much as what happened during it.
+"""
+
+
+def compact_dtype(nvec) -> np.dtype:
+    """Smallest integer dtype that holds every value of a MultiDiscrete space with these nvec"""
+    max_value = int(np.max(nvec)) - 1
+    for dtype in (np.uint8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def view_observation(obs: np.ndarray, layout: np.dtype) -> np.ndarray:
+    """
+    Named fields of an observation (or of a batch, shape (n, obs size)), e.g.
+    view_observation(obs, env.observation_layout)["elevators"]["floor"]. The fields are views of obs when it is
+    C-contiguous with the layout's item dtype (as the envs' observations are), of a converted copy otherwise (float
+    casts, slices, ...)
+    """
+    obs = np.ascontiguousarray(obs, dtype=_item_dtype(layout))
+    return obs.view(layout)[..., 0]
+
+
+def _item_dtype(layout: np.dtype) -> np.dtype:
+    """Scalar dtype of the fields of a layout"""
+    while layout.names is not None or layout.subdtype is not None:
+        layout = layout.subdtype[0] if layout.subdtype is not None else layout.fields[layout.names[0]][0]
+    return layout
+
+
+class ObservationEncoder:
+    def __init__(self, num_elevators: int, num_floors: int):
+        # final curriculum sizes
+        self.num_elevators = num_elevators
+        self.num_floors = num_floors
+
+        self.nvec: list[int] = []
+        self.up_offset = 0      # "up" hall buttons of each floor
+        self.down_offset = 0    # "down" hall buttons of each floor
+
+    def observation_space(self, compact: bool = False) -> spaces.Space:
+        # compact: smallest dtype that fits the observation (uint8 up to 255 floors) instead of int64
+        return spaces.MultiDiscrete(self.nvec, dtype=compact_dtype(self.nvec) if compact else np.int64)
+
+    def layout(self, dtype=np.int64) -> np.dtype | None:
+        """Structured dtype naming the fields of the observation vector (see view_observation), None if not a vector"""
+        return None
+
+    def new_buffer(self, observation_space: spaces.Space) -> np.ndarray:
+        """Observation buffer the encoder writes into"""
+        return np.zeros(observation_space.shape, dtype=observation_space.dtype)
+
+    def observation(self, obs: np.ndarray, copy: bool = True):
+        """Observation returned by the env for its buffer (a copy, or views of the buffer itself)"""
+        return obs.copy() if copy else obs
+
+    @property
+    def action_nvec(self) -> list[int]:
+        return [self.num_floors for _ in range(self.num_elevators)]  # target floor for each elevator
+
+    def apply_action(self, env, action: np.ndarray):
+        """Sets the target floor of each current elevator"""
+        for i, elevator in enumerate(env.elevators):
+            elevator.target_floor = min(env.num_floors - 1, action[i])
+
+    def action_mask(self, env) -> np.ndarray:
+        """Valid values of every action, concatenated (the action_masks format of sb3_contrib's MaskablePPO)"""
+        mask = np.zeros((self.num_elevators, self.num_floors), dtype=bool)
+        mask[: env.num_elevators, : env.num_floors] = True  # current floors of current elevators
+        mask[env.num_elevators :, 0] = True  # elevators that do not exist yet ignore their action
+        return mask.reshape(-1)
+
+    def rebuild(self, env, obs: np.ndarray):
+        raise NotImplementedError
+
+    def elevator(self, env, obs: np.ndarray, elev_idx: int):
+        """Position and direction fields of an elevator"""
+        raise NotImplementedError
+
+    def car_button(self, env, obs: np.ndarray, elev_idx: int, floor: int):
+        """Passengers of an elevator going to floor"""
+        raise NotImplementedError
+
+    def hall(self, env, obs: np.ndarray, floor: int):
+        """Passengers waiting on floor"""
+        num_up, num_down = env.hall_calls(floor)
+        obs[self.up_offset + floor] = int(num_up > 0)  # whether "up" button is pressed
+        obs[self.down_offset + floor] = int(num_down > 0)  # whether "down" button is pressed
+
+    def arrival(self, env, obs: np.ndarray, floor: int, target_floor: int):
+        """A request just appeared on floor"""
+        if target_floor > floor:
+            obs[self.up_offset + floor] = 1
+        else:
+            obs[self.down_offset + floor] = 1
+
+
+class FeatureEncoder(ObservationEncoder):
+    """
+    Current number of elevators and floors, then per elevator: floor, target floor, time to next floor (optional),
+    previous direction (optional), direction and whether each floor button is pressed; then the "up" and "down"
+    buttons of each floor.
+
+    With max_people, buttons are replaced by passenger counts (saturating at max_people - 1) and the hall buttons by a
+    single count of waiting passengers per floor.
+    """
+
+    def __init__(self, num_elevators: int, num_floors: int, time_to_next_floor: bool = False, prev_direction: bool = True, max_people: int | None = None):
+        super().__init__(num_elevators, num_floors)
+        self.time_to_next_floor = time_to_next_floor
+        self.prev_direction = prev_direction
+        self.max_people = max_people
+
+        fields = [num_floors, num_floors]  # floor num, target floor
+        if time_to_next_floor:
+            fields.append(TIME_PER_FLOOR + 1)  # time to next floor
+        self.prev_direction_idx = len(fields)
+        if prev_direction:
+            fields.append(3)  # previous direction
+        self.direction_idx = len(fields)
+        fields.append(3)  # direction
+        self.buttons_idx = len(fields)
+        fields += [2 if max_people is None else max_people] * num_floors  # floor buttons (or people) in the elevator
+        self.elev_obs_len = len(fields)
+
+        self.nvec = [num_elevators + 1, num_floors + 1]  # cur num elevators, cur num floors
+        self.nvec += fields * num_elevators
+        self.up_offset = len(self.nvec)
+        if max_people is None:
+            self.down_offset = self.up_offset + num_floors
+            self.nvec += [2] * (2 * num_floors)  # "up" and "down" buttons
+        else:
+            self.nvec += [max_people] * num_floors  # num people waiting on each floor
+
+    def elev_offset(self, elev_idx: int) -> int:
+        return 2 + elev_idx * self.elev_obs_len
+
+    def _elevator_fields(self, dtype) -> list[tuple]:
+        fields = [("floor", dtype), ("target", dtype)]
+        if self.time_to_next_floor:
+            fields.append(("time_to_next_floor", dtype))
+        if self.prev_direction:
+            fields.append(("prev_direction", dtype))
+        fields.append(("direction", dtype))
+        return fields
+
+    def layout(self, dtype=np.int64) -> np.dtype:
+        elevator = self._elevator_fields(dtype) + [("buttons" if self.max_people is None else "passengers", dtype, (self.num_floors,))]
+        fields = [("num_elevators", dtype), ("num_floors", dtype), ("elevators", np.dtype(elevator), (self.num_elevators,))]
+        if self.max_people is None:
+            fields += [("up", dtype, (self.num_floors,)), ("down", dtype, (self.num_floors,))]
+        else:
+            fields.append(("waiting", dtype, (self.num_floors,)))
+        return np.dtype(fields)
+
+    def rebuild(self, env, obs: np.ndarray):
+        obs[:] = 0
+        obs[0] = env.num_elevators
+        obs[1] = env.num_floors
+        for i in range(env.num_elevators):
+            self.elevator(env, obs, i)
+            for j in range(env.num_floors):
+                self.car_button(env, obs, i, j)
+
+        # fill in rest of elevators, idle at the ground floor
+        for i in range(env.num_elevators, self.num_elevators):
+            obs[self.elev_offset(i) + self.direction_idx] = ElevatorState.IDLE
+
+        for j in range(env.num_floors):
+            self.hall(env, obs, j)
+
+    def elevator(self, env, obs: np.ndarray, elev_idx: int):
+        offset = self.elev_offset(elev_idx)
+        elevator = env.elevators[elev_idx]
+        obs[offset] = elevator.floor
+        obs[offset + 1] = elevator.target_floor
+        if self.time_to_next_floor:
+            obs[offset + 2] = elevator.time_to_next_floor
+        if self.prev_direction:
+            obs[offset + self.prev_direction_idx] = env.prev_elev_direction[elev_idx]
+        obs[offset + self.direction_idx] = elevator.state
+
+    def car_button(self, env, obs: np.ndarray, elev_idx: int, floor: int):
+        num_passengers = env.passengers_to(env.elevators[elev_idx], floor)
+        if self.max_people is None:
+            obs[self.elev_offset(elev_idx) + self.buttons_idx + floor] = int(num_passengers > 0)
+        else:
+            obs[self.elev_offset(elev_idx) + self.buttons_idx + floor] = min(num_passengers, self.max_people - 1)
+
+    def hall(self, env, obs: np.ndarray, floor: int):
+        if self.max_people is None:
+            super().hall(env, obs, floor)
+        else:
+            obs[self.up_offset + floor] = min(len(env.unassigned_requests[floor]), self.max_people - 1)
+
+    def arrival(self, env, obs: np.ndarray, floor: int, target_floor: int):
+        if self.max_people is None:
+            super().arrival(env, obs, floor, target_floor)
+        else:
+            self.hall(env, obs, floor)
+
+
+class OneHotEncoder(ObservationEncoder):
+    """Same information as FeatureEncoder(time_to_next_floor=False, prev_direction=False), one-hot encoded, with one-hot actions"""
+
+    def __init__(self, num_elevators: int, num_floors: int):
+        super().__init__(num_elevators, num_floors)
+
+        self.floors_offset = num_elevators + 1
+        self.elevators_offset = self.floors_offset + num_floors + 1
+        self.elev_obs_len = 3 * num_floors + 3  # one-hot floor, target floor, direction, then floor buttons
+        self.up_offset = self.elevators_offset + num_elevators * self.elev_obs_len
+        self.down_offset = self.up_offset + num_floors
+        self.nvec = [2] * (self.down_offset + num_floors)
+
+    @property
+    def action_nvec(self) -> list[int]:
+        return [2 for _ in range(self.num_elevators * self.num_floors)]  # one-hot target floor for each elevator
+
+    def apply_action(self, env, action: np.ndarray):
+        for i, elevator in enumerate(env.elevators):
+            start = i * self.num_floors
+            elevator.target_floor = np.argmax(action[start : start + env.num_floors])
+
+    def action_mask(self, env) -> np.ndarray:
+        # the one-hot slots of floors and elevators that do not exist yet must stay 0
+        mask = np.zeros((self.num_elevators, self.num_floors, 2), dtype=bool)
+        mask[:, :, 0] = True
+        mask[: env.num_elevators, : env.num_floors, 1] = True
+        return mask.reshape(-1)
+
+    def elev_offset(self, elev_idx: int) -> int:
+        return self.elevators_offset + elev_idx * self.elev_obs_len
+
+    def layout(self, dtype=np.int64) -> np.dtype:
+        # every field one-hot, except the floor buttons
+        num_floors = self.num_floors
+        elevator = [("floor", dtype, (num_floors,)), ("target", dtype, (num_floors,)), ("direction", dtype, (3,)), ("buttons", dtype, (num_floors,))]
+        return np.dtype([
+            ("num_elevators", dtype, (self.num_elevators + 1,)),
+            ("num_floors", dtype, (num_floors + 1,)),
+            ("elevators", np.dtype(elevator), (self.num_elevators,)),
+            ("up", dtype, (num_floors,)),
+            ("down", dtype, (num_floors,)),
+        ])
+
+    def rebuild(self, env, obs: np.ndarray):
+        obs[:] = 0
+        obs[env.num_elevators] = 1
+        obs[self.floors_offset + env.num_floors] = 1
+        for i in range(env.num_elevators):
+            self.elevator(env, obs, i)
+            for j in range(env.num_floors):
+                self.car_button(env, obs, i, j)
+
+        # fill in rest of elevators (every direction set, as the original one-hot env did)
+        for i in range(env.num_elevators, self.num_elevators):
+            offset = self.elev_offset(i) + 2 * self.num_floors
+            obs[offset : offset + 3] = 1
+
+        for j in range(env.num_floors):
+            self.hall(env, obs, j)
+
+    def elevator(self, env, obs: np.ndarray, elev_idx: int):
+        offset = self.elev_offset(elev_idx)
+        elevator = env.elevators[elev_idx]
+        num_floors = self.num_floors
+        obs[offset : offset + 2 * num_floors + 3] = 0
+        obs[offset + elevator.floor] = 1
+        obs[offset + num_floors + elevator.target_floor] = 1
+        obs[offset + 2 * num_floors + elevator.state] = 1
+
+    def car_button(self, env, obs: np.ndarray, elev_idx: int, floor: int):
+        num_passengers = env.passengers_to(env.elevators[elev_idx], floor)
+        obs[self.elev_offset(elev_idx) + 2 * self.num_floors + 3 + floor] = int(num_passengers > 0)
+
+
+class PackedEncoder(FeatureEncoder):
+    """
+    FeatureEncoder layout with every button vector (the floor buttons of each elevator, the "up" and the "down" hall
+    buttons) packed 8 floors per byte, as np.packbits(buttons, bitorder="little"). The other fields keep one byte
+    each, so the observation is a uint8 Box, about 8x smaller than the unpacked observation for tall buildings.
+
+    unpack() recovers the unpacked observation, and unpack_spec describes it for training.extractors.UnpackingExtractor.
+    """
+
+    def __init__(self, encoder: FeatureEncoder):
+        if not isinstance(encoder, FeatureEncoder) or encoder.max_people is not None:
+            raise ValueError("packed observations need an encoder with button observations (v3, v5, v6, v7)")
+        # the fields that are not buttons keep one byte: every value must fit in the packed dtype
+        max_nvec = np.iinfo(np.uint8).max + 1
+        if max(encoder.nvec) > max_nvec:
+            raise ValueError(f"packed observations hold fields of at most {max_nvec} values (nvec), so at most {max_nvec - 1} floors (the number of floors field takes num_floors + 1 values); this encoder has a field of {max(encoder.nvec)} values ({encoder.num_floors} floors)")
+        super().__init__(encoder.num_elevators, encoder.num_floors, encoder.time_to_next_floor, encoder.prev_direction)
+        self.unpacked_nvec = self.nvec
+
+        # unpacked slot k is bit unpacked_bit[k] of byte unpacked_byte[k], or the whole byte when unpacked_bit[k] < 0
+        unpacked_byte, unpacked_bit = [0, 1], [-1, -1]
+        num_words = (self.num_floors + 7) // 8
+        offset = 2
+        for _ in range(self.num_elevators):
+            unpacked_byte += list(range(offset, offset + self.buttons_idx))
+            unpacked_bit += [-1] * self.buttons_idx
+            offset += self.buttons_idx
+            unpacked_byte += [offset + j // 8 for j in range(self.num_floors)]
+            unpacked_bit += [j % 8 for j in range(self.num_floors)]
+            offset += num_words
+        self.elev_obs_len = self.buttons_idx + num_words
+        self.up_offset = offset
+        self.down_offset = offset + num_words
+        for hall_offset in (self.up_offset, self.down_offset):
+            unpacked_byte += [hall_offset + j // 8 for j in range(self.num_floors)]
+            unpacked_bit += [j % 8 for j in range(self.num_floors)]
+        self.obs_len = self.down_offset + num_words
+
+        self.unpacked_byte = np.array(unpacked_byte)
+        self.unpacked_bit = np.array(unpacked_bit)
+        self.nvec = [256] * self.obs_len
+
+    @property
+    def unpack_spec(self) -> dict:
+        return {"unpacked_byte": self.unpacked_byte.tolist(), "unpacked_bit": self.unpacked_bit.tolist(), "unpacked_nvec": list(self.unpacked_nvec)}
+
+    def observation_space(self, compact: bool = False) -> spaces.Space:
+        return spaces.Box(0, 255, (self.obs_len,), dtype=np.uint8)
+
+    def layout(self, dtype=np.uint8) -> np.dtype:
+        # buttons as bytes of packed bits
+        num_words = (self.num_floors + 7) // 8
+        elevator = self._elevator_fields(dtype) + [("buttons", dtype, (num_words,))]
+        return np.dtype([
+            ("num_elevators", dtype),
+            ("num_floors", dtype),
+            ("elevators", np.dtype(elevator), (self.num_elevators,)),
+            ("up", dtype, (num_words,)),
+            ("down", dtype, (num_words,)),
+        ])
+
+    def unpack(self, obs: np.ndarray) -> np.ndarray:
+        """Observation (or batch of observations) in the unpacked FeatureEncoder layout"""
+        values = obs[..., self.unpacked_byte].astype(np.int64)
+        return np.where(self.unpacked_bit < 0, values, (values >> np.maximum(self.unpacked_bit, 0)) & 1)
+
+    @staticmethod
+    def _set_bit(obs: np.ndarray, offset: int, floor: int, value: bool):
+        if value:
+            obs[offset + floor // 8] |= 1 << (floor % 8)
+        else:
+            obs[offset + floor // 8] &= ~(1 << (floor % 8)) & 0xFF
+
+    def car_button(self, env, obs: np.ndarray, elev_idx: int, floor: int):
+        num_passengers = env.passengers_to(env.elevators[elev_idx], floor)
+        self._set_bit(obs, self.elev_offset(elev_idx) + self.buttons_idx, floor, num_passengers > 0)
+
+    def hall(self, env, obs: np.ndarray, floor: int):
+        num_up, num_down = env.hall_calls(floor)
+        self._set_bit(obs, self.up_offset, floor, num_up > 0)
+        self._set_bit(obs, self.down_offset, floor, num_down > 0)
+
+    def arrival(self, env, obs: np.ndarray, floor: int, target_floor: int):
+        self._set_bit(obs, self.up_offset if target_floor > floor else self.down_offset, floor, True)
+
+
+class TokenEncoder(ObservationEncoder):
+    """
+    One feature token per elevator and per floor, for permutation-equivariant policies (training/policies.py), as a Dict
+    observation padded to the final curriculum size:
+        cars:        per elevator: floor and target floor heights, time to next floor / TIME_PER_FLOOR, one-hot previous
+                     direction and one-hot direction
+        car_buttons: per elevator and floor, whether the floor button is pressed
+        floors:      per floor: "up" and "down" buttons and height
+        car_mask, floor_mask: 1 for the current elevators and floors
+    Heights are floor / (num_floors - 1) (0 in a one-floor building), so that the features mean the same in every
+    building size. All the fields are views into one float32 buffer.
+    """
+
+    CAR_FEATURES = 9
+    FLOOR_FEATURES = 3
+
+    def __init__(self, num_elevators: int, num_floors: int):
+        super().__init__(num_elevators, num_floors)
+        shapes = {
+            "cars": (num_elevators, self.CAR_FEATURES),
+            "car_buttons": (num_elevators, num_floors),
+            "floors": (num_floors, self.FLOOR_FEATURES),
+            "car_mask": (num_elevators,),
+            "floor_mask": (num_floors,),
+        }
+        self.fields: dict[str, tuple[int, tuple]] = {}
+        offset = 0
+        for name, shape in shapes.items():
+            self.fields[name] = (offset, shape)
+            offset += int(np.prod(shape))
+        self.obs_len = offset
+
+        self.cars_offset = self.fields["cars"][0]
+        self.buttons_offset = self.fields["car_buttons"][0]
+        self.floors_offset = self.fields["floors"][0]
+
+    def observation_space(self, compact: bool = False) -> spaces.Space:
+        return spaces.Dict({name: spaces.Box(0, 1, shape, dtype=np.float32) for name, (_, shape) in self.fields.items()})
+
+    def new_buffer(self, observation_space: spaces.Space) -> np.ndarray:
+        return np.zeros(self.obs_len, dtype=np.float32)
+
+    def observation(self, obs: np.ndarray, copy: bool = True) -> dict[str, np.ndarray]:
+        if copy:
+            obs = obs.copy()
+        return {name: obs[offset : offset + int(np.prod(shape))].reshape(shape) for name, (offset, shape) in self.fields.items()}
+
+    def rebuild(self, env, obs: np.ndarray):
+        obs[:] = 0
+        car_mask, floor_mask = self.fields["car_mask"][0], self.fields["floor_mask"][0]
+        obs[car_mask : car_mask + env.num_elevators] = 1
+        obs[floor_mask : floor_mask + env.num_floors] = 1
+        for i in range(env.num_elevators):
+            self.elevator(env, obs, i)
+            for j in range(env.num_floors):
+                self.car_button(env, obs, i, j)
+        for j in range(env.num_floors):
+            obs[self.floors_offset + j * self.FLOOR_FEATURES + 2] = j / max(env.num_floors - 1, 1)
+            self.hall(env, obs, j)
+
+    def elevator(self, env, obs: np.ndarray, elev_idx: int):
+        offset = self.cars_offset + elev_idx * self.CAR_FEATURES
+        elevator = env.elevators[elev_idx]
+        obs[offset] = elevator.floor / max(env.num_floors - 1, 1)
+        obs[offset + 1] = elevator.target_floor / max(env.num_floors - 1, 1)
+        obs[offset + 2] = getattr(elevator, "time_to_next_floor", 0) / TIME_PER_FLOOR
+        obs[offset + 3 : offset + 9] = 0
+        obs[offset + 3 + env.prev_elev_direction[elev_idx]] = 1
+        obs[offset + 6 + elevator.state] = 1
+
+    def car_button(self, env, obs: np.ndarray, elev_idx: int, floor: int):
+        num_passengers = env.passengers_to(env.elevators[elev_idx], floor)
+        obs[self.buttons_offset + elev_idx * self.num_floors + floor] = num_passengers > 0
+
+    def hall(self, env, obs: np.ndarray, floor: int):
+        num_up, num_down = env.hall_calls(floor)
+        offset = self.floors_offset + floor * self.FLOOR_FEATURES
+        obs[offset] = num_up > 0
+        obs[offset + 1] = num_down > 0
+
+    def arrival(self, env, obs: np.ndarray, floor: int, target_floor: int):
+        obs[self.floors_offset + floor * self.FLOOR_FEATURES + (0 if target_floor > floor else 1)] = 1
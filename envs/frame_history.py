@@ -0,0 +1,131 @@
+import gym
+from gym import spaces
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv, VecEnvWrapper
+
+"""
+Observations of the last k timesteps, for policies that need more temporal context than the previous direction (v7
+observations have no time to next floor and one step of history).
+"""
+
+
+class RingHistory:
+    """
+    Last k observation vectors of one env (batch_shape ()) or of a batch of envs (batch_shape (num_envs,)), in a buffer
+    of 2k frames where every frame is written twice, at slots s and s + k. The last k frames are then always the
+    contiguous slots [pos, pos + k), so frames and stacked are views of the buffer: no copy and no allocation per step.
+    """
+
+    def __init__(self, k: int, batch_shape: tuple, frame_size: int, dtype):
+        self.k = k
+        self.buffer = np.zeros((*batch_shape, 2 * k, frame_size), dtype=dtype)
+        self.pos = 0
+
+    def push(self, obs: np.ndarray):
+        """Appends the newest frame(s), dropping the oldest"""
+        k, pos = self.k, self.pos
+        self.buffer[..., pos, :] = obs
+        self.buffer[..., pos + k, :] = obs
+        self.pos = (pos + 1) % k
+
+    def fill(self, obs: np.ndarray, index=...):
+        """Every frame of the history (of the envs of index) is obs, for the first observation of an episode"""
+        self.buffer[index] = np.expand_dims(obs, -2)
+
+    @property
+    def frames(self) -> np.ndarray:
+        """(..., k, frame size) view of the last k frames, oldest first, valid until the next push"""
+        return self.buffer[..., self.pos : self.pos + self.k, :]
+
+    @property
+    def stacked(self) -> np.ndarray:
+        """(..., k * frame size) view of the last k frames, oldest first (the stacked observation)"""
+        return self.frames.reshape(*self.buffer.shape[:-2], -1)
+
+
+def stacked_space(observation_space: spaces.Space, k: int) -> spaces.Space:
+    """Space of k observations of observation_space, oldest first"""
+    if isinstance(observation_space, spaces.MultiDiscrete):
+        return spaces.MultiDiscrete(np.tile(observation_space.nvec, k), dtype=observation_space.dtype)
+    if isinstance(observation_space, spaces.Box) and len(observation_space.shape) == 1:
+        return spaces.Box(np.tile(observation_space.low, k), np.tile(observation_space.high, k), dtype=observation_space.dtype)
+    raise ValueError(f"frame history needs vector observations (MultiDiscrete or 1d Box), not {observation_space}")
+
+
+def stacked_layout(layout: np.dtype | None, k: int) -> np.dtype | None:
+    """Layout of the stacked observation for encoders.view_observation: a "frames" field of k frames of layout"""
+    return None if layout is None else np.dtype([("frames", layout, (k,))])
+
+
+class FrameHistoryWrapper(gym.Wrapper):
+    """
+    Observations of the last k timesteps of an elevator env, oldest first, flattened into one vector (same dtype, so
+    MlpPolicy and CompactPPO take it as is); the first observation of an episode fills the whole history.
+
+    step and reset return copies; with copy=False they return the ring buffer view itself, valid until the next step
+    (as pooled envs do; enough under DummyVecEnv, which copies observations). frames is the (k, obs size) view.
+    observation_layout describes the stacked vector: view_observation(obs, env.observation_layout)["frames"][-1] is the
+    latest frame's fields.
+    """
+
+    def __init__(self, env: gym.Env, k: int = 4, copy: bool = True):
+        super().__init__(env)
+        self.k = k
+        self.copy = copy
+        self.observation_space = stacked_space(env.observation_space, k)
+        self.observation_layout = stacked_layout(getattr(env, "observation_layout", None), k)
+        self.history = RingHistory(k, (), env.observation_space.shape[0], env.observation_space.dtype)
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self.history.frames
+
+    def _observation(self) -> np.ndarray:
+        return self.history.stacked.copy() if self.copy else self.history.stacked
+
+    def reset(self, **kwargs):
+        self.history.fill(self.env.reset(**kwargs))
+        return self._observation()
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        self.history.push(obs)
+        return self._observation(), reward, done, info
+
+
+class VecFrameHistory(VecEnvWrapper):
+    """
+    FrameHistoryWrapper for VecEnvs (ElevatorV7VecEnv, SharedMemoryVecEnv, ...): one ring buffer for all the envs.
+    An env that finishes its episode starts a new history from its reset observation, and its terminal_observation
+    info is the stacked history ending with its terminal observation. frames is the (num_envs, k, obs size) view.
+    """
+
+    def __init__(self, venv: VecEnv, k: int = 4, copy: bool = True):
+        super().__init__(venv, observation_space=stacked_space(venv.observation_space, k))
+        self.k = k
+        self.copy = copy
+        self.observation_layout = stacked_layout(getattr(venv, "observation_layout", None), k)
+        self.history = RingHistory(k, (venv.num_envs,), venv.observation_space.shape[0], venv.observation_space.dtype)
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self.history.frames
+
+    def _observation(self) -> np.ndarray:
+        return self.history.stacked.copy() if self.copy else self.history.stacked
+
+    def reset(self):
+        self.history.fill(self.venv.reset())
+        return self._observation()
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        history = self.history
+        for env_idx in np.flatnonzero(dones):
+            if "terminal_observation" in infos[env_idx]:
+                # history before the reset, with the terminal observation as the newest frame
+                infos[env_idx]["terminal_observation"] = np.concatenate([history.stacked[env_idx, history.buffer.shape[-1] :], infos[env_idx]["terminal_observation"]])
+        history.push(obs)
+        for env_idx in np.flatnonzero(dones):
+            history.fill(obs[env_idx], env_idx)
+        return self._observation(), rewards, dones, infos
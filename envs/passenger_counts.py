@@ -0,0 +1,105 @@
+class CountRequestsMixin:
+    """
+    Replaces an Elevator's dict of Request lists with fixed-size per-floor counts.
+
+    requests[f] is the number of passengers going to floor f and request_time_sum[f] is the sum of their
+    time_requested, so boarding and alighting are O(1) per target floor and num_passengers() is O(1).
+    """
+
+    def __init__(self, floor: int, target_floor: int, num_floors: int):
+        super().__init__(floor, target_floor, num_floors)
+        self.requests: list[int] = [0] * num_floors
+        self.request_time_sum: list[int] = [0] * num_floors
+        self.passengers: int = 0
+
+    def add_request(self, request):
+        self.add_requests(request.target_floor, 1, request.time_requested)
+
+    def add_requests(self, target_floor: int, num_requests: int, time_sum: int):
+        self.requests[target_floor] += num_requests
+        self.request_time_sum[target_floor] += time_sum
+        self.passengers += num_requests
+
+    def clear_requests(self):
+        for target_floor in range(len(self.requests)):
+            self.requests[target_floor] = 0
+            self.request_time_sum[target_floor] = 0
+        self.passengers = 0
+
+    def batch_remove_requests(self, floor: int | None = None) -> int:
+        if floor is None:
+            floor = self.floor
+        num_requests = self.requests[floor]
+        self.requests[floor] = 0
+        self.request_time_sum[floor] = 0
+        self.passengers -= num_requests
+        return num_requests
+
+    def num_passengers(self):
+        return self.passengers
+
+
+class HallQueue:
+    """
+    Passengers waiting on one floor, stored as counts per target floor and per direction.
+
+    Each count comes with the running sum of the passengers' time_requested, so the total waiting time at
+    time t is `t * count - time_sum` without visiting the passengers.
+    """
+
+    def __init__(self, floor: int, num_floors: int):
+        self.floor = floor
+        self.counts: list[int] = [0] * num_floors
+        self.time_sums: list[int] = [0] * num_floors
+
+        self.num_up = 0
+        self.num_down = 0
+        self.up_time_sum = 0
+        self.down_time_sum = 0
+
+        # target floors of the last board, in boarded_floors[:num_boarded_floors] (preallocated, boarding creates no list)
+        self.boarded_floors: list[int] = [0] * num_floors
+        self.num_boarded_floors = 0
+
+    def add(self, target_floor: int, time_requested: int):
+        self.counts[target_floor] += 1
+        self.time_sums[target_floor] += time_requested
+        if target_floor > self.floor:
+            self.num_up += 1
+            self.up_time_sum += time_requested
+        else:
+            self.num_down += 1
+            self.down_time_sum += time_requested
+
+    def clear(self):
+        for target_floor in range(len(self.counts)):
+            self.counts[target_floor] = 0
+            self.time_sums[target_floor] = 0
+        self.num_up = self.num_down = 0
+        self.up_time_sum = self.down_time_sum = 0
+
+    def board(self, elevator):
+        """Moves every waiting passenger into `elevator`, returns the number of passengers moved"""
+        num_boarded = self.num_up + self.num_down
+        self.num_boarded_floors = 0
+        if num_boarded == 0:
+            return 0
+        counts, time_sums, boarded_floors = self.counts, self.time_sums, self.boarded_floors
+        num_boarded_floors = 0
+        for target_floor in range(len(counts)):
+            if counts[target_floor]:
+                elevator.add_requests(target_floor, counts[target_floor], time_sums[target_floor])
+                counts[target_floor] = 0
+                time_sums[target_floor] = 0
+                boarded_floors[num_boarded_floors] = target_floor
+                num_boarded_floors += 1
+        self.num_boarded_floors = num_boarded_floors
+        self.num_up = self.num_down = 0
+        self.up_time_sum = self.down_time_sum = 0
+        return num_boarded
+
+    def __len__(self):
+        return self.num_up + self.num_down
+
+    def __repr__(self):
+        return f"HallQueue[{self.floor=}, {self.num_up=}, {self.num_down=}, {self.counts=}]"
@@ -0,0 +1,92 @@
+import json
+import time
+from collections import defaultdict
+
+"""
+Opt-in per-phase timing of the env steps (profile=True), to see where the time of a training run goes.
+"""
+
+
+class StepProfiler:
+    """
+    Cumulative time and number of calls per phase. Phases are timed either by wrapping a method of an object
+    (instrument, for the object-based envs: nothing is wrapped when profiling is off, so a disabled profiler costs
+    nothing) or by laps inside a single step function (start and lap, for ElevatorV7VecEnv).
+
+    Phases can be nested (step contains all the others), their times are not meant to be added up.
+    """
+
+    def __init__(self):
+        self.times: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+        self._last = time.perf_counter()
+
+    def wrap(self, phase: str, fn):
+        """fn timed as phase (fn itself if it is already timed)"""
+        if getattr(fn, "profiled_phase", None) is not None:
+            return fn
+        times, calls, clock = self.times, self.calls, time.perf_counter
+
+        def profiled(*args, **kwargs):
+            start = clock()
+            result = fn(*args, **kwargs)
+            times[phase] += clock() - start
+            calls[phase] += 1
+            return result
+
+        profiled.profiled_phase = phase
+        return profiled
+
+    def instrument(self, obj, name: str, phase: str | None = None):
+        """
+        Replaces obj's method name by a timed one (on the instance only), phase defaults to the method name. obj must
+        belong to the caller: a shared object would be timed into every profiler that instruments it, nested.
+        """
+        setattr(obj, name, self.wrap(phase or name, getattr(obj, name)))
+
+    def start(self):
+        """Starts the laps of a step"""
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str):
+        """Adds the time since the previous lap (or start) to phase"""
+        now = time.perf_counter()
+        self.times[phase] += now - self._last
+        self.calls[phase] += 1
+        self._last = now
+
+    def clear(self):
+        self.times.clear()
+        self.calls.clear()
+
+    def report(self) -> dict[str, dict[str, float]]:
+        """Per phase, most expensive first: total seconds, calls, microseconds per call and per step, share of the step time"""
+        step_time = self.times.get("step", 0.0)
+        num_steps = self.calls.get("step", 0)
+        return {
+            phase: {
+                "seconds": seconds,
+                "calls": self.calls[phase],
+                "us_per_call": 1e6 * seconds / max(self.calls[phase], 1),
+                "us_per_step": 1e6 * seconds / max(num_steps, 1),
+                "step_share": seconds / step_time if step_time else 0.0,
+            }
+            for phase, seconds in sorted(self.times.items(), key=lambda item: -item[1])
+        }
+
+    def record(self, logger, prefix: str = "profile"):
+        """Records time per step and share of the step of every phase to an SB3 logger (TensorBoard)"""
+        for phase, stats in self.report().items():
+            logger.record(f"{prefix}/{phase}_us_per_step", stats["us_per_step"])
+            logger.record(f"{prefix}/{phase}_step_share", stats["step_share"])
+
+    def save(self, path: str):
+        """Writes the report as JSON"""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def __str__(self):
+        lines = [f"{'phase':<18} {'us/step':>10} {'share':>7} {'calls':>10}"]
+        for phase, stats in self.report().items():
+            lines.append(f"{phase:<18} {stats['us_per_step']:>10.2f} {stats['step_share']:>7.1%} {stats['calls']:>10}")
+        return "\n".join(lines)
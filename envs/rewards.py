@@ -0,0 +1,31 @@
+"""
+Reward functions of the elevator env versions, called once per step after the elevators have moved and exchanged
+passengers (and before the step's new requests appear).
+"""
+
+
+class WaitingReward:
+    """per_timestep for every passenger waiting or riding, per_success for every passenger released"""
+
+    def __init__(self, per_timestep: int = -1, per_success: int = 0):
+        self.per_timestep = per_timestep
+        self.per_success = per_success
+
+    def __call__(self, env, num_released: int):
+        return self.per_success * num_released + self.per_timestep * (env.num_riding + env.num_waiting)
+
+
+class SquaredWaitingReward:
+    """
+    Penalizes every passenger by the increase of (time since request)^2 over the timestep, 2 * (t - time_requested) - 1,
+    so that long waits cost more than several short ones.
+    """
+
+    def __init__(self, per_success: int = 0):
+        self.per_success = per_success
+
+    def __call__(self, env, num_released: int):
+        # sum over passengers of 2 * (t - time_requested) - 1, from the env's passenger counts and time sums
+        num_passengers = env.num_riding + env.num_waiting
+        time_sum = env.riding_time_sum + env.waiting_time_sum
+        return self.per_success * num_released - (2 * (env.t * num_passengers - time_sum) - num_passengers)
@@ -0,0 +1,285 @@
+import multiprocessing as mp
+import traceback
+from typing import Any, Callable, Optional, Sequence
+
+import gym
+from gym import spaces
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv
+
+"""
+SB3 VecEnv of elevator envs in worker processes that exchange actions, observations, rewards and dones through shared
+memory, with a pair of semaphores per worker instead of pickled pipe messages on every step.
+"""
+
+# what a worker does when its step semaphore is released
+STEP = 0
+COMMAND = 1  # read a command from the pipe (reset, get_attr, ...)
+
+# how a worker's step went
+STEP_OK = 0
+STEP_INFOS = 1  # some info dicts were not empty, they follow on the pipe
+STEP_ERROR = 2  # the traceback follows on the pipe
+
+
+def _shared_array(ctx, shape: tuple, dtype) -> tuple[Any, np.ndarray]:
+    dtype = np.dtype(dtype)
+    buffer = ctx.RawArray("b", max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return buffer, _view(buffer, shape, dtype)
+
+
+def _view(buffer, shape: tuple, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    return np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def _shared_memory_worker(conn, env_fns: CloudpickleWrapper, env_indices: list[int], worker_idx: int, buffers: dict, shapes: dict, step_ready, step_done):
+    from stable_baselines3.common.env_util import is_wrapped
+
+    envs = [env_fn() for env_fn in env_fns.var]
+    views = {name: _view(buffers[name], *shapes[name]) for name in buffers}
+    first, last = env_indices[0], env_indices[-1] + 1
+    obs, terminal_obs = views["obs"][first:last], views["terminal_obs"][first:last]
+    actions, rewards, dones = views["actions"][first:last], views["rewards"][first:last], views["dones"][first:last]
+    commands, status = views["commands"], views["status"]
+
+    while True:
+        step_ready.acquire()
+        if commands[worker_idx] == STEP:
+            try:
+                infos = []
+                for i, env in enumerate(envs):
+                    observation, reward, done, info = env.step(actions[i])
+                    if done:
+                        # save final observation where the main process can get it, then reset
+                        terminal_obs[i] = observation
+                        observation = env.reset()
+                    obs[i] = observation
+                    rewards[i] = reward
+                    dones[i] = done
+                    if info:
+                        infos.append((i, info))
+                status[worker_idx] = STEP_INFOS if infos else STEP_OK
+                if infos:
+                    conn.send(infos)
+            except Exception:
+                status[worker_idx] = STEP_ERROR
+                conn.send(traceback.format_exc())
+            step_done.release()
+            continue
+
+        command, data = conn.recv()
+        if command == "close":
+            for env in envs:
+                env.close()
+            conn.close()
+            break
+        try:
+            if command == "reset":
+                for i, env in enumerate(envs):
+                    obs[i] = env.reset()
+                result = None
+            elif command == "get_attr":
+                result = [getattr(envs[i], data[1]) for i in data[0]]
+            elif command == "set_attr":
+                result = [setattr(envs[i], data[1], data[2]) for i in data[0]]
+            elif command == "env_method":
+                result = [getattr(envs[i], data[1])(*data[2], **data[3]) for i in data[0]]
+            elif command == "is_wrapped":
+                result = [is_wrapped(envs[i], data[1]) for i in data[0]]
+            elif command == "seed":
+                # the elevator envs draw everything from env.rng
+                for i, env in enumerate(envs):
+                    env.rng = np.random.default_rng(None if data is None else data + i)
+                result = None
+            else:
+                raise NotImplementedError(f"`{command}` is not implemented in the worker")
+            conn.send((True, result))
+        except Exception:
+            # the worker stays alive, the main process raises the error
+            conn.send((False, traceback.format_exc()))
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Runs the envs of env_fns in num_workers processes (all cores by default), each stepping a contiguous group of envs.
+
+    step_async writes the actions to shared memory and releases every worker's semaphore; step_wait waits for the
+    workers and returns the observations, rewards and dones they wrote to shared memory. Only non-empty info dicts and
+    non-step commands (reset, get_attr, env_method, ...) go through pipes. step_async_worker and step_wait_worker do the
+    same for a single worker's group (worker_envs[worker]), so that a rollout loop can compute the actions of a group
+    while the other groups are stepping.
+
+    An error in a worker (during a step or a command) is raised in the main process as a RuntimeError with the worker's
+    traceback, once every worker has finished the step; the workers stay alive and the envs keep the state they reached
+    (as in DummyVecEnv, the envs of a group before the failing one have stepped). Commands cannot be sent to a worker
+    that is stepping. Observations must be arrays (Box, MultiDiscrete, MultiBinary or Discrete spaces, not Dict).
+    """
+
+    def __init__(self, env_fns: Sequence[Callable[[], gym.Env]], num_workers: Optional[int] = None, start_method: Optional[str] = None):
+        num_envs = len(env_fns)
+        num_workers = min(num_workers or mp.cpu_count(), num_envs)
+
+        # the spaces, to size the shared memory before the workers start
+        env = env_fns[0]()
+        observation_space, action_space = env.observation_space, env.action_space
+        self.observation_layout = getattr(env, "observation_layout", None)
+        env.close()
+        if isinstance(observation_space, spaces.Dict):
+            raise ValueError("SharedMemoryVecEnv needs array observations, not a Dict (token_obs)")
+        super().__init__(num_envs, observation_space, action_space)
+
+        if start_method is None:
+            # as SubprocVecEnv: forkserver where available, it is thread-safe
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        shapes = {
+            "obs": ((num_envs, *observation_space.shape), observation_space.dtype),
+            "terminal_obs": ((num_envs, *observation_space.shape), observation_space.dtype),
+            "actions": ((num_envs, *action_space.shape), action_space.dtype),
+            "rewards": ((num_envs,), np.float32),
+            "dones": ((num_envs,), bool),
+            "commands": ((num_workers,), np.int64),
+            "status": ((num_workers,), np.int64),
+        }
+        buffers = {}
+        for name, (shape, dtype) in shapes.items():
+            buffers[name], view = _shared_array(ctx, shape, dtype)
+            setattr(self, f"_{name}", view)
+
+        self.worker_envs: list[list[int]] = [group.tolist() for group in np.array_split(np.arange(num_envs), num_workers)]
+        self._worker_of = np.repeat(np.arange(num_workers), [len(group) for group in self.worker_envs])
+        self.conns = []
+        self.processes = []
+        self.step_ready = []
+        self.step_done = []
+        for worker_idx, env_indices in enumerate(self.worker_envs):
+            conn, worker_conn = ctx.Pipe()
+            step_ready, step_done = ctx.Semaphore(0), ctx.Semaphore(0)
+            args = (worker_conn, CloudpickleWrapper([env_fns[i] for i in env_indices]), env_indices, worker_idx, buffers, shapes, step_ready, step_done)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_shared_memory_worker, args=args, daemon=True)
+            process.start()
+            worker_conn.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+            self.step_ready.append(step_ready)
+            self.step_done.append(step_done)
+        self._waiting = [False] * num_workers
+        self.closed = False
+
+    @property
+    def num_workers(self) -> int:
+        return len(self.worker_envs)
+
+    def _command(self, worker_idx: int, command: str, data=None):
+        """Runs a non-step command in a worker, returns its result or raises its error"""
+        process = self.processes[worker_idx]
+        if not process.is_alive():
+            raise RuntimeError(f"worker {worker_idx} died (exit code {process.exitcode})")
+        if self._waiting[worker_idx]:
+            # the worker reads its command slot when it is released, a command now would replace the pending step
+            raise RuntimeError(f"worker {worker_idx} is stepping, call step_wait_worker({worker_idx}) before {command}")
+        self._commands[worker_idx] = COMMAND
+        self.conns[worker_idx].send((command, data))
+        self.step_ready[worker_idx].release()
+        while not self.conns[worker_idx].poll(1.0):
+            if not process.is_alive():
+                raise RuntimeError(f"worker {worker_idx} died (exit code {process.exitcode})")
+        ok, result = self.conns[worker_idx].recv()
+        if not ok:
+            raise RuntimeError(f"worker {worker_idx} failed on {command}:\n{result}")
+        return result
+
+    def step_async_worker(self, worker_idx: int, actions: np.ndarray):
+        """Starts stepping the envs of worker_envs[worker_idx] with their actions"""
+        env_indices = self.worker_envs[worker_idx]
+        self._actions[env_indices[0] : env_indices[-1] + 1] = np.asarray(actions).reshape(len(env_indices), *self._actions.shape[1:])
+        self._commands[worker_idx] = STEP
+        self._waiting[worker_idx] = True
+        self.step_ready[worker_idx].release()
+
+    def step_wait_worker(self, worker_idx: int):
+        """Waits for the envs of worker_envs[worker_idx], returns their (obs, rewards, dones, infos)"""
+        while not self.step_done[worker_idx].acquire(timeout=1.0):
+            if not self.processes[worker_idx].is_alive():
+                self._waiting[worker_idx] = False
+                raise RuntimeError(f"worker {worker_idx} died (exit code {self.processes[worker_idx].exitcode})")
+        self._waiting[worker_idx] = False
+        env_indices = self.worker_envs[worker_idx]
+        group = slice(env_indices[0], env_indices[-1] + 1)
+        infos = [{} for _ in env_indices]
+        if self._status[worker_idx] == STEP_ERROR:
+            raise RuntimeError(f"worker {worker_idx} failed:\n{self.conns[worker_idx].recv()}")
+        if self._status[worker_idx] == STEP_INFOS:
+            for i, info in self.conns[worker_idx].recv():
+                infos[i] = info
+        dones = self._dones[group].copy()
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self._terminal_obs[env_indices[i]].copy()
+        return self._obs[group].copy(), self._rewards[group].copy(), dones, infos
+
+    def step_async(self, actions: np.ndarray):
+        actions = np.asarray(actions).reshape(self.num_envs, *self._actions.shape[1:])
+        for worker_idx, env_indices in enumerate(self.worker_envs):
+            self.step_async_worker(worker_idx, actions[env_indices[0] : env_indices[-1] + 1])
+
+    def step_wait(self):
+        # wait for every worker even when one failed, so that none is left with a step to collect
+        results, errors = [], []
+        for worker_idx in range(self.num_workers):
+            try:
+                results.append(self.step_wait_worker(worker_idx))
+            except RuntimeError as e:
+                errors.append(str(e))
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        obs, rewards, dones, infos = zip(*results)
+        return np.concatenate(obs), np.concatenate(rewards), np.concatenate(dones), [info for group in infos for info in group]
+
+    def reset(self):
+        for worker_idx in range(self.num_workers):
+            self._command(worker_idx, "reset")
+        return self._obs.copy()
+
+    def close(self):
+        if self.closed:
+            return
+        for worker_idx in range(self.num_workers):
+            if not self.processes[worker_idx].is_alive():
+                continue
+            if self._waiting[worker_idx]:
+                self.step_done[worker_idx].acquire()
+            self._commands[worker_idx] = COMMAND
+            self.conns[worker_idx].send(("close", None))
+            self.step_ready[worker_idx].release()
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def seed(self, seed: Optional[int] = None):
+        for worker_idx, env_indices in enumerate(self.worker_envs):
+            self._command(worker_idx, "seed", None if seed is None else seed + env_indices[0])
+        return [None if seed is None else seed + i for i in range(self.num_envs)]
+
+    def _worker_calls(self, indices) -> list[tuple[int, list[int]]]:
+        """(worker, indices of its envs relative to its group) for the envs of indices"""
+        calls = {}
+        for env_idx in self._get_indices(indices):
+            worker_idx = int(self._worker_of[env_idx])
+            calls.setdefault(worker_idx, []).append(env_idx - self.worker_envs[worker_idx][0])
+        return list(calls.items())
+
+    def get_attr(self, attr_name: str, indices=None) -> list[Any]:
+        return [value for worker_idx, local in self._worker_calls(indices) for value in self._command(worker_idx, "get_attr", (local, attr_name))]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None):
+        for worker_idx, local in self._worker_calls(indices):
+            self._command(worker_idx, "set_attr", (local, attr_name, value))
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list[Any]:
+        return [value for worker_idx, local in self._worker_calls(indices) for value in self._command(worker_idx, "env_method", (local, method_name, method_args, method_kwargs))]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list[bool]:
+        return [value for worker_idx, local in self._worker_calls(indices) for value in self._command(worker_idx, "is_wrapped", (local, wrapper_class))]
@@ -0,0 +1,243 @@
+import math
+import struct
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .arrivals import ArrivalStream
+from .elevator_base import Request
+from .passenger_counts import HallQueue
+
+# counters restored when the env has them
+COUNTERS = ("t", "total_t", "num_dropped_off", "num_total_requests", "episode_rew", "num_waiting", "num_riding", "waiting_time_sum", "riding_time_sum")
+
+# binary layout of EnvSnapshot.to_bytes, STATE_VERSION changes whenever the layout does
+STATE_MAGIC = b"RLEV"
+STATE_VERSION = 1
+# magic, version, flags, counters present (bit per COUNTERS entry), num elevators, num floors, num previous directions,
+# num riding passengers and num waiting passengers (Request lists), num arrivals, arrival cursor
+STATE_HEADER = struct.Struct("<4sHHHxxiiiiiqq")
+COUNT_BASED_FLAG = 1
+ARRIVALS_FLAG = 2
+FLOAT_REWARD_FLAG = 4
+MASK_64 = (1 << 64) - 1
+
+
+@dataclass(frozen=True, slots=True)
+class EnvSnapshot:
+    """
+    Immutable copy of an elevator env's simulation state (not its spaces, curriculum history or arrival source).
+
+    Requests are frozen dataclasses, so they are shared with the env instead of copied.
+    """
+    num_elevators: int
+    num_floors: int
+    count_based: bool           # CountElevator / HallQueue state instead of Request lists
+    elevator_class: type
+    elevators: tuple            # (floor, target floor, state, time to next floor, passengers) per elevator
+    unassigned_requests: tuple  # passengers waiting on each floor
+    prev_elev_direction: tuple
+    counters: tuple             # values of COUNTERS, None when the env does not have it
+    arrival_stream: Any
+    arrival_cursor: int
+    rng_state: dict
+
+    def to_bytes(self) -> bytes:
+        """
+        The state in a fixed little-endian layout (STATE_HEADER, then integer arrays and the PCG64 state), which does
+        not depend on the classes of the env, see from_bytes
+        """
+        count_based = self.count_based
+        num_elevators, num_floors = self.num_elevators, self.num_floors
+        flags = COUNT_BASED_FLAG if count_based else 0
+
+        counters = np.zeros(len(COUNTERS), dtype=np.int64)
+        counters_present = 0
+        for i, (name, value) in enumerate(zip(COUNTERS, self.counters)):
+            if value is None:
+                continue
+            counters_present |= 1 << i
+            if name == "episode_rew" and not float(value).is_integer():
+                flags |= FLOAT_REWARD_FLAG
+                counters[i] = np.float64(value).view(np.int64)
+            else:
+                counters[i] = value
+
+        sections = [counters, np.array([elevator[:4] for elevator in self.elevators], dtype=np.int32), np.array(self.prev_elev_direction, dtype=np.int32)]
+        num_riding = num_waiting = 0
+        if count_based:
+            sections.append(np.array([elevator[4][0] for elevator in self.elevators], dtype=np.int32))
+            sections.append(np.array([elevator[4][1] for elevator in self.elevators], dtype=np.int64))
+            sections.append(np.array([queue[0] for queue in self.unassigned_requests], dtype=np.int32))
+            sections.append(np.array([queue[1] for queue in self.unassigned_requests], dtype=np.int64))
+            sections.append(np.array([queue[2:4] for queue in self.unassigned_requests], dtype=np.int32))
+            sections.append(np.array([queue[4:6] for queue in self.unassigned_requests], dtype=np.int64))
+        else:
+            # one (elevator or floor, target floor, time requested) row per passenger
+            riding = [(elev_idx, request.target_floor, request.time_requested) for elev_idx, elevator in enumerate(self.elevators) for _, requests in elevator[4] for request in requests]
+            waiting = [(floor, request.target_floor, request.time_requested) for floor, queue in enumerate(self.unassigned_requests) for request in queue]
+            num_riding, num_waiting = len(riding), len(waiting)
+            sections.append(np.array(riding, dtype=np.int64).reshape(-1, 3))
+            sections.append(np.array(waiting, dtype=np.int64).reshape(-1, 3))
+
+        num_arrivals = 0
+        if self.arrival_stream is not None:
+            flags |= ARRIVALS_FLAG
+            num_arrivals = len(self.arrival_stream)
+            sections += [self.arrival_stream.times.astype(np.int64), self.arrival_stream.starting_floors.astype(np.int32), self.arrival_stream.target_floors.astype(np.int32)]
+
+        rng_state = self.rng_state
+        if rng_state["bit_generator"] != "PCG64":
+            raise ValueError(f"only the PCG64 state (np.random.default_rng) is serialized, not {rng_state['bit_generator']}")
+        state, inc = rng_state["state"]["state"], rng_state["state"]["inc"]
+        sections.append(np.array([state & MASK_64, state >> 64, inc & MASK_64, inc >> 64, rng_state["has_uint32"], rng_state["uinteger"]], dtype=np.uint64))
+
+        header = STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, flags, counters_present, num_elevators, num_floors, len(self.prev_elev_direction), num_riding, num_waiting, num_arrivals, self.arrival_cursor)
+        return header + b"".join(section.tobytes() for section in sections)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, elevator_class: type) -> "EnvSnapshot":
+        """Snapshot of to_bytes data, restored with elevator_class (the env's, Elevator or CountElevator of its movement)"""
+        if len(data) < STATE_HEADER.size:
+            raise ValueError(f"{len(data)} bytes are not an elevator env state")
+        magic, version, flags, counters_present, num_elevators, num_floors, num_directions, num_riding, num_waiting, num_arrivals, arrival_cursor = STATE_HEADER.unpack_from(data)
+        if magic != STATE_MAGIC:
+            raise ValueError("not an elevator env state")
+        if version != STATE_VERSION:
+            raise ValueError(f"unsupported state version {version} (this version reads {STATE_VERSION})")
+        count_based = bool(flags & COUNT_BASED_FLAG)
+        offset = STATE_HEADER.size
+
+        def read(dtype, *shape) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(data, dtype=dtype, count=math.prod(shape), offset=offset).reshape(shape)
+            offset += array.nbytes
+            return array
+
+        counters = read(np.int64, len(COUNTERS)).tolist()
+        for i, name in enumerate(COUNTERS):
+            if not counters_present >> i & 1:
+                counters[i] = None
+            elif name == "episode_rew" and flags & FLOAT_REWARD_FLAG:
+                counters[i] = float(np.int64(counters[i]).view(np.float64))
+        elevators = read(np.int32, num_elevators, 4).tolist()
+        prev_elev_direction = tuple(read(np.int32, num_directions).tolist())
+
+        if count_based:
+            car_counts = read(np.int32, num_elevators, num_floors).tolist()
+            car_time_sums = read(np.int64, num_elevators, num_floors).tolist()
+            hall_counts = read(np.int32, num_floors, num_floors).tolist()
+            hall_time_sums = read(np.int64, num_floors, num_floors).tolist()
+            hall_counts_by_direction = read(np.int32, num_floors, 2).tolist()
+            hall_time_sums_by_direction = read(np.int64, num_floors, 2).tolist()
+            passengers = [(tuple(counts), tuple(time_sums)) for counts, time_sums in zip(car_counts, car_time_sums)]
+            unassigned_requests = tuple((tuple(counts), tuple(time_sums), *by_direction, *time_sums_by_direction)
+                                        for counts, time_sums, by_direction, time_sums_by_direction in zip(hall_counts, hall_time_sums, hall_counts_by_direction, hall_time_sums_by_direction))
+        else:
+            riding: list[dict[int, list[Request]]] = [{} for _ in range(num_elevators)]
+            for elev_idx, target_floor, time_requested in read(np.int64, num_riding, 3).tolist():
+                riding[elev_idx].setdefault(target_floor, []).append(Request(time_requested, target_floor))
+            passengers = [tuple((floor, tuple(requests)) for floor, requests in elevator_requests.items()) for elevator_requests in riding]
+            waiting: list[list[Request]] = [[] for _ in range(num_floors)]
+            for floor, target_floor, time_requested in read(np.int64, num_waiting, 3).tolist():
+                waiting[floor].append(Request(time_requested, target_floor))
+            unassigned_requests = tuple(tuple(queue) for queue in waiting)
+
+        arrival_stream = None
+        if flags & ARRIVALS_FLAG:
+            arrival_stream = ArrivalStream(read(np.int64, num_arrivals), read(np.int32, num_arrivals), read(np.int32, num_arrivals))
+
+        state_low, state_high, inc_low, inc_high, has_uint32, uinteger = read(np.uint64, 6).tolist()
+        rng_state = {"bit_generator": "PCG64", "state": {"state": state_high << 64 | state_low, "inc": inc_high << 64 | inc_low}, "has_uint32": has_uint32, "uinteger": uinteger}
+
+        return cls(
+            num_elevators=num_elevators,
+            num_floors=num_floors,
+            count_based=count_based,
+            elevator_class=elevator_class,
+            elevators=tuple((*elevator, elevator_passengers) for elevator, elevator_passengers in zip(elevators, passengers)),
+            unassigned_requests=unassigned_requests,
+            prev_elev_direction=prev_elev_direction,
+            counters=tuple(counters),
+            arrival_stream=arrival_stream,
+            arrival_cursor=arrival_cursor,
+            rng_state=rng_state,
+        )
+
+
+def _snapshot_passengers(elevator, count_based: bool) -> tuple:
+    if count_based:
+        return tuple(elevator.requests), tuple(elevator.request_time_sum)
+    return tuple((floor, tuple(requests)) for floor, requests in elevator.requests.items() if requests)
+
+
+def _restore_passengers(elevator, passengers: tuple, count_based: bool):
+    if count_based:
+        counts, time_sums = passengers
+        elevator.requests = list(counts)
+        elevator.request_time_sum = list(time_sums)
+        elevator.passengers = sum(counts)
+    else:
+        elevator.requests = {floor: list(requests) for floor, requests in passengers}
+
+
+def _snapshot_queue(queue, count_based: bool) -> tuple:
+    if count_based:
+        return tuple(queue.counts), tuple(queue.time_sums), queue.num_up, queue.num_down, queue.up_time_sum, queue.down_time_sum
+    return tuple(queue)
+
+
+def _restore_queue(floor: int, num_floors: int, queue: tuple, count_based: bool):
+    if count_based:
+        hall_queue = HallQueue(floor, num_floors)
+        counts, time_sums, hall_queue.num_up, hall_queue.num_down, hall_queue.up_time_sum, hall_queue.down_time_sum = queue
+        hall_queue.counts = list(counts)
+        hall_queue.time_sums = list(time_sums)
+        return hall_queue
+    return list(queue)
+
+
+def snapshot_env(env) -> EnvSnapshot:
+    stream = getattr(env, "arrival_stream", None)
+    count_based = getattr(env, "count_based", False)
+    return EnvSnapshot(
+        num_elevators=env.num_elevators,
+        num_floors=env.num_floors,
+        count_based=count_based,
+        elevator_class=type(env.elevators[0]),
+        elevators=tuple((elevator.floor, elevator.target_floor, elevator.state, getattr(elevator, "time_to_next_floor", 0), _snapshot_passengers(elevator, count_based)) for elevator in env.elevators),
+        unassigned_requests=tuple(_snapshot_queue(env.unassigned_requests[i], count_based) for i in range(env.num_floors)),
+        prev_elev_direction=tuple(env.prev_elev_direction),
+        counters=tuple(getattr(env, name, None) for name in COUNTERS),
+        arrival_stream=stream,
+        arrival_cursor=stream.cursor if stream is not None else 0,
+        rng_state=env.rng.bit_generator.state,
+    )
+
+
+def restore_env(env, snapshot: EnvSnapshot):
+    env.num_elevators = snapshot.num_elevators
+    env.num_floors = snapshot.num_floors
+
+    env.elevators = []
+    for floor, target_floor, state, time_to_next_floor, passengers in snapshot.elevators:
+        elevator = snapshot.elevator_class(floor, target_floor, snapshot.num_floors)
+        elevator.state = state
+        if hasattr(elevator, "time_to_next_floor"):
+            elevator.time_to_next_floor = time_to_next_floor
+        _restore_passengers(elevator, passengers, snapshot.count_based)
+        env.elevators.append(elevator)
+
+    env.unassigned_requests = {i: _restore_queue(i, snapshot.num_floors, queue, snapshot.count_based) for i, queue in enumerate(snapshot.unassigned_requests)}
+    env.prev_elev_direction = list(snapshot.prev_elev_direction)
+
+    for name, value in zip(COUNTERS, snapshot.counters):
+        if value is not None:
+            setattr(env, name, value)
+
+    if snapshot.arrival_stream is not None:
+        # the stream's arrays are shared, the copy only has its own cursor
+        env.arrival_stream = snapshot.arrival_stream.copy()
+        env.arrival_stream.cursor = snapshot.arrival_cursor
+    env.rng.bit_generator.state = snapshot.rng_state
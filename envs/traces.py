@@ -0,0 +1,145 @@
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .arrivals import ArrivalStream
+
+"""
+Binary hall-call trace format (little endian):
+    header (32 bytes): magic b"RLVTRACE", version (uint32), unused (uint32), num_calls (uint64), num_floors (uint32), unused (uint32)
+    ticks (int64[num_calls], sorted), origins (uint16[num_calls]), destinations (uint16[num_calls])
+Each column is contiguous, so a reader can memory-map one column without touching the others.
+"""
+TRACE_MAGIC = b"RLVTRACE"
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct("<8sIIQII")
+
+TICK_DTYPE = np.dtype("<i8")
+FLOOR_DTYPE = np.dtype("<u2")
+
+
+def _floors(floors) -> np.ndarray:
+    """floors as FLOOR_DTYPE, raises on floors it cannot hold instead of wrapping them around"""
+    floors = np.asarray(floors, dtype=np.int64)
+    max_floor = np.iinfo(FLOOR_DTYPE).max
+    if floors.size and (floors.min() < 0 or floors.max() > max_floor):
+        raise ValueError(f"trace floors must be between 0 and {max_floor}, got floors from {floors.min()} to {floors.max()} (shift them so that the lowest floor is 0)")
+    return floors.astype(FLOOR_DTYPE)
+
+
+class TraceWriter:
+    """Writes a trace from chunks of calls without holding the whole trace in memory (columns are spooled to temp files)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.num_calls = 0
+        self.num_floors = 0
+        self.last_tick = None
+
+        self._tmp_dir = tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path)))
+        self._columns = [open(os.path.join(self._tmp_dir.name, name), "wb") for name in ("ticks", "origins", "destinations")]
+
+    def write(self, ticks, origins, destinations):
+        ticks = np.asarray(ticks, dtype=TICK_DTYPE)
+        origins = _floors(origins)
+        destinations = _floors(destinations)
+        if not ticks.shape == origins.shape == destinations.shape or ticks.ndim != 1:
+            raise ValueError(f"ticks, origins and destinations must be vectors of the same length, got shapes {ticks.shape}, {origins.shape} and {destinations.shape}")
+        if ticks.size == 0:
+            return
+        if (np.diff(ticks) < 0).any() or (self.last_tick is not None and ticks[0] < self.last_tick):
+            raise ValueError("calls must be sorted by tick")
+
+        for column, values in zip(self._columns, (ticks, origins, destinations)):
+            column.write(values.tobytes())
+        self.num_calls += ticks.size
+        self.num_floors = max(self.num_floors, int(origins.max()) + 1, int(destinations.max()) + 1)
+        self.last_tick = int(ticks[-1])
+
+    def close(self):
+        with open(self.path, "wb") as out:
+            out.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, self.num_calls, self.num_floors, 0))
+            for column in self._columns:
+                column.close()
+                with open(column.name, "rb") as f:
+                    while chunk := f.read(1 << 24):
+                        out.write(chunk)
+        self._tmp_dir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def discard(self):
+        """Deletes the spooled calls without writing the trace"""
+        for column in self._columns:
+            column.close()
+        self._tmp_dir.cleanup()
+
+    def __exit__(self, exc_type, exc, tb):
+        # no partial trace under the final name when the conversion failed
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class Trace:
+    """Read-only memory map of a trace file, processes mapping the same file share its pages"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic, version, _, num_calls, num_floors, _ = TRACE_HEADER.unpack(f.read(TRACE_HEADER.size))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} is not an RLevator trace")
+        if version != TRACE_VERSION:
+            raise ValueError(f"{path} has trace version {version}, expected {TRACE_VERSION}")
+
+        self.path = path
+        self.num_calls = num_calls
+        self.num_floors = num_floors
+
+        offset = TRACE_HEADER.size
+        self.ticks = np.memmap(path, dtype=TICK_DTYPE, mode="r", offset=offset, shape=(num_calls,))
+        offset += num_calls * TICK_DTYPE.itemsize
+        self.origins = np.memmap(path, dtype=FLOOR_DTYPE, mode="r", offset=offset, shape=(num_calls,))
+        offset += num_calls * FLOOR_DTYPE.itemsize
+        self.destinations = np.memmap(path, dtype=FLOOR_DTYPE, mode="r", offset=offset, shape=(num_calls,))
+
+    def __len__(self):
+        return self.num_calls
+
+    def __repr__(self):
+        return f"Trace[{self.path=}, {self.num_calls=}, {self.num_floors=}]"
+
+
+class TraceArrivals:
+    """
+    Replays a trace file, episode after episode, as consecutive windows of num_steps ticks (wrapping around at the end).
+
+    Only the calls of the current window are read from the memory map, so the size of the trace does not matter.
+    Calls involving floors that the building does not have (e.g. early curriculum stages) are dropped. A trace without
+    calls gives episodes without arrivals.
+    """
+
+    def __init__(self, path: str, start_tick: int | None = None):
+        self.trace = Trace(path)
+        self.first_tick = int(self.trace.ticks[0]) if len(self.trace) > 0 else 0
+        self.end_tick = int(self.trace.ticks[-1]) + 1 if len(self.trace) > 0 else 0
+        self.window_start = self.first_tick if start_tick is None else start_tick
+
+    def sample(self, rng: np.random.Generator, num_floors: int, num_steps: int) -> ArrivalStream:
+        if self.window_start >= self.end_tick:
+            self.window_start = self.first_tick
+        window_start, window_end = self.window_start, self.window_start + num_steps
+        self.window_start = window_end
+
+        ticks = self.trace.ticks
+        lo, hi = np.searchsorted(ticks, [window_start, window_end])
+        times = ticks[lo:hi] - window_start
+        starting_floors = self.trace.origins[lo:hi].astype(np.int64)
+        target_floors = self.trace.destinations[lo:hi].astype(np.int64)
+
+        valid = (starting_floors < num_floors) & (target_floors < num_floors) & (starting_floors != target_floors)
+        return ArrivalStream(times[valid], starting_floors[valid], target_floors[valid])
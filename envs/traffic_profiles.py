@@ -0,0 +1,100 @@
+import numpy as np
+
+from .arrivals import ArrivalStream
+
+
+class TrafficProfile:
+    """
+    Time-of-day traffic as origin-destination rate matrices.
+
+    rates[b, o, d] is the expected number of requests per timestep from floor o to floor d during time bucket b,
+    each bucket lasts bucket_len timesteps, and the profile repeats after all buckets (e.g. one day).
+    """
+
+    def __init__(self, rates: np.ndarray, bucket_len: int):
+        rates = np.array(rates, dtype=np.float64)
+        assert rates.ndim == 3 and rates.shape[1] == rates.shape[2], f"rates must be (buckets, floors, floors), got {rates.shape}"
+        assert (rates >= 0).all(), "rates must be non-negative"
+        rates[:, np.arange(rates.shape[1]), np.arange(rates.shape[1])] = 0  # nobody travels to their own floor
+
+        self.rates = rates
+        self.bucket_len = int(bucket_len)
+        self.num_buckets, self.num_floors = rates.shape[:2]
+
+    @property
+    def period(self) -> int:
+        return self.num_buckets * self.bucket_len
+
+    def save(self, path: str):
+        np.savez_compressed(path, rates=self.rates.astype(np.float32), bucket_len=self.bucket_len)
+
+    @classmethod
+    def load(cls, path: str) -> "TrafficProfile":
+        with np.load(path) as data:
+            return cls(data["rates"], int(data["bucket_len"]))
+
+    @classmethod
+    def office_day(cls, num_floors: int, bucket_len: int = 3600, peak_rate: float = 1.0, lobby: int = 0) -> "TrafficProfile":
+        """
+        24 hourly buckets with a morning up-peak (lobby to upper floors), a lunch peak (both ways), an evening
+        down-peak (upper floors to lobby) and light interfloor traffic during working hours.
+        peak_rate is the total number of requests per timestep at the height of the up-peak.
+        """
+        hour = np.arange(24)
+        up_peak = np.exp(-0.5 * ((hour - 8.5) / 0.75) ** 2)
+        down_peak = np.exp(-0.5 * ((hour - 17.5) / 0.75) ** 2)
+        lunch = 0.4 * np.exp(-0.5 * ((hour - 12.5) / 0.6) ** 2)
+        interfloor = np.where((hour >= 7) & (hour < 19), 0.1, 0.01)
+
+        upper = np.array([floor for floor in range(num_floors) if floor != lobby])
+        rates = np.zeros((24, num_floors, num_floors))
+        rates[:, lobby, upper] += (peak_rate * (up_peak + lunch) / len(upper))[:, None]
+        rates[:, upper, lobby] += (peak_rate * (down_peak + lunch) / len(upper))[:, None]
+        rates[:, upper[:, None], upper[None, :]] += (peak_rate * interfloor / max(1, len(upper) * (len(upper) - 1)))[:, None, None]
+        return cls(rates, bucket_len)
+
+    def __repr__(self):
+        return f"TrafficProfile[{self.num_buckets=}, {self.bucket_len=}, {self.num_floors=}]"
+
+
+class ProfileArrivals:
+    """
+    Arrival source for a TrafficProfile.
+
+    For every building size it is used with, the profile is compiled once into per-bucket total rates and
+    normalized cumulative origin-destination tables (bucket b occupies the values (b, b + 1]), so all of an
+    episode's requests are placed with a single searchsorted. Episodes start at start_step of the profile,
+    or at a random time of day when start_step is None.
+    """
+
+    def __init__(self, profile: TrafficProfile, start_step: int | None = 0):
+        self.profile = profile
+        self.start_step = start_step
+        self._compiled: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def compile(self, num_floors: int) -> tuple[np.ndarray, np.ndarray]:
+        if num_floors not in self._compiled:
+            assert num_floors <= self.profile.num_floors, f"profile has {self.profile.num_floors} floors, env has {num_floors}"
+            rates = self.profile.rates[:, :num_floors, :num_floors].reshape(self.profile.num_buckets, -1)
+            totals = rates.sum(axis=1)
+
+            cum = np.cumsum(rates, axis=1)
+            cum = np.divide(cum, totals[:, None], out=np.ones_like(cum), where=totals[:, None] > 0)
+            cum[:, -1] = 1  # guard against rounding so every bucket ends exactly at b + 1
+            cum += np.arange(self.profile.num_buckets)[:, None]
+
+            self._compiled[num_floors] = (totals, cum.ravel())
+        return self._compiled[num_floors]
+
+    def sample(self, rng: np.random.Generator, num_floors: int, num_steps: int) -> ArrivalStream:
+        totals, cum = self.compile(num_floors)
+
+        start = rng.integers(self.profile.period) if self.start_step is None else self.start_step
+        buckets = (start + np.arange(num_steps)) // self.profile.bucket_len % self.profile.num_buckets
+        counts = rng.poisson(totals[buckets])
+
+        times = np.repeat(np.arange(num_steps), counts)
+        request_buckets = buckets[times]
+        cells = np.searchsorted(cum, request_buckets + rng.random(times.size), side="right")
+        cells -= request_buckets * num_floors * num_floors
+        return ArrivalStream(times, cells // num_floors, cells % num_floors)
@@ -0,0 +1,63 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from agents.standard_elevator_v7_controller import StandardElevatorV7Controller
+from envs.elevator_fleet import ElevatorFleetSim
+
+
+def load_portfolio(path: str):
+    """CSV with num_floors, num_elevators and request_prob columns, one row per building"""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    return [int(row["num_floors"]) for row in rows], [int(row["num_elevators"]) for row in rows], [float(row["request_prob"]) for row in rows]
+
+
+def main(args):
+    if args.portfolio is not None:
+        num_floors, num_elevators, request_prob = load_portfolio(args.portfolio)
+    else:
+        # random portfolio
+        rng = np.random.default_rng(int(args.seed))
+        num_buildings = int(args.num_buildings)
+        num_floors = rng.integers(int(args.min_floors), int(args.max_floors) + 1, num_buildings)
+        num_elevators = np.maximum(1, num_floors // int(args.floors_per_elevator))
+        request_prob = rng.uniform(0.1, 0.6, num_buildings)
+
+    sim = ElevatorFleetSim(num_floors, num_elevators, request_prob=request_prob, episode_len=int(args.episode_len), random_seed=int(args.seed))
+    controller = StandardElevatorV7Controller(sim)
+
+    start = time.time()
+    episodes = [sim.run(controller) for _ in range(int(args.episodes))]
+    elapsed = time.time() - start
+
+    # mean over episodes, per building
+    stats = {name: np.mean([episode[name] for episode in episodes], axis=0) for name in episodes[0]}
+    print(f"Simulated {args.episodes} episodes of {sim.num_buildings} buildings in {elapsed:.1f}s")
+    for name, values in stats.items():
+        print(f"    {name}: mean {values.mean():.2f}, min {values.min():.2f}, max {values.max():.2f}")
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["building", "request_prob"] + list(stats))
+            for building in range(sim.num_buildings):
+                writer.writerow([building, np.broadcast_to(request_prob, (sim.num_buildings,))[building]] + [values[building] for values in stats.values()])
+        print(f"Per-building results written to {args.output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--portfolio', '-p', default=None, help='CSV of buildings (num_floors, num_elevators, request_prob columns), instead of a random portfolio')
+    parser.add_argument('--num_buildings', '-b', default=100, help='Number of buildings of the random portfolio')
+    parser.add_argument('--min_floors', default=3, help='Fewest floors of a random building')
+    parser.add_argument('--max_floors', default=30, help='Most floors of a random building')
+    parser.add_argument('--floors_per_elevator', default=8, help='Floors served per elevator in a random building')
+    parser.add_argument('--episodes', '-n', default=10, help='Number of episodes to simulate')
+    parser.add_argument('--episode_len', '-l', default=200, help='Number of timesteps per episode')
+    parser.add_argument('--output', '-o', default=None, help='Path of a CSV to write the per-building results to')
+    parser.add_argument('--seed', '-s', default=0, help='Random seed to use')
+    args = parser.parse_args()
+    main(args)
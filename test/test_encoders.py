@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from envs.elevator_v7 import ElevatorV7Env
+from envs.encoders import FeatureEncoder, PackedEncoder
+
+"""
+Checks the size limits of the observation encoders. Run with pytest from the repository root.
+"""
+
+
+def test_packed_encoder_floor_limit():
+    # 255 floors: the number of floors field takes 256 values, the most a byte holds
+    env = ElevatorV7Env(num_elevators_start=2, num_floors_start=255, packed_obs=True)
+    unpacked_env = ElevatorV7Env(num_elevators_start=2, num_floors_start=255)
+    rng = np.random.default_rng(0)
+    obs, unpacked_obs = env.reset(), unpacked_env.reset()
+    for _ in range(50):
+        action = rng.integers(env.action_space.nvec)
+        obs, _, _, _ = env.step(action)
+        unpacked_obs, _, _, _ = unpacked_env.step(action)
+    assert obs[1] == 255
+    assert np.array_equal(env.encoder.unpack(obs), unpacked_obs)
+
+    with pytest.raises(ValueError, match="at most 255 floors"):
+        PackedEncoder(FeatureEncoder(2, 256))
+
+
+def test_token_encoder_one_floor():
+    # heights are 0 in a one-floor building (no passengers: they would have no other floor to go to)
+    env = ElevatorV7Env(num_elevators_start=2, num_floors_start=1, token_obs=True, request_prob=0.0)
+    obs = env.reset()
+    for _ in range(10):
+        obs, _, _, _ = env.step(np.zeros(2, dtype=np.int64))
+    assert not obs["cars"][:, :2].any() and not obs["floors"][:, 2].any()
@@ -0,0 +1,91 @@
+import argparse
+import importlib
+import os
+
+import numpy as np
+import pytest
+
+"""
+Regression test of the env versions (v2 to v7 and go-back, all configurations of ElevatorCoreEnv): fixed action
+sequences replayed through every version must give the observations, rewards and dones recorded in
+test/data/env_versions.npz, in list, count_based and pooled mode. The recording comes from the separate v2-v7 classes
+the core replaced; to record again (only when a change of results is intended), run from the repository root
+PYTHONPATH=. python test/test_env_versions.py --record
+"""
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "env_versions.npz")
+
+VERSIONS = {
+    "v2": ("envs.elevator_v2", "ElevatorV2Env"),
+    "v3": ("envs.elevator_v3", "ElevatorV3Env"),
+    "v4": ("envs.elevator_v4", "ElevatorV4Env"),
+    "v5": ("envs.elevator_v5", "ElevatorV5Env"),
+    "go_back": ("envs.elevator_v5_double_back", "ElevatorV5GoBackEnv"),
+    "v6": ("envs.elevator_v6", "ElevatorV6Env"),
+    "v7": ("envs.elevator_v7", "ElevatorV7Env"),
+}
+
+# name: (env kwargs, number of episodes)
+SCENARIOS = {
+    "fixed": (dict(num_elevators_start=2, num_floors_start=6, episode_len=50, random_seed=3, request_prob=0.4), 3),
+    "curriculum": (dict(num_elevators_start=2, num_floors_start=3, curriculum=True, num_elevators_end=2, num_floors_end=5, episode_len=20, random_seed=5, request_prob=0.3), 14),
+}
+
+MODES = {"list": {}, "count_based": {"count_based": True}, "pooled": {"pooled": True}}
+
+
+def make_env(version: str, scenario: str, **options):
+    module, name = VERSIONS[version]
+    kwargs, _ = SCENARIOS[scenario]
+    return getattr(importlib.import_module(module), name)(**kwargs, **options)
+
+
+def replay(env, num_episodes: int) -> dict[str, np.ndarray]:
+    """Observations (after every reset and step), rewards and dones of num_episodes episodes of random actions"""
+    rng = np.random.default_rng(0)
+    observations, rewards, dones = [], [], []
+    for _ in range(num_episodes):
+        observations.append(np.array(env.reset()))
+        done = False
+        while not done:
+            obs, reward, done, _ = env.step(rng.integers(env.action_space.nvec))
+            observations.append(np.array(obs))
+            rewards.append(reward)
+            dones.append(done)
+    return {"obs": np.stack(observations), "rewards": np.array(rewards, dtype=np.float64), "dones": np.array(dones)}
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with np.load(BASELINE_PATH) as data:
+        return dict(data)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("scenario", SCENARIOS)
+@pytest.mark.parametrize("version", VERSIONS)
+def test_version_matches_baseline(baseline, version, scenario, mode):
+    result = replay(make_env(version, scenario, **MODES[mode]), SCENARIOS[scenario][1])
+    for name, values in result.items():
+        expected = baseline[f"{version}/{scenario}/{name}"]
+        assert values.shape == expected.shape, name
+        mismatch = np.flatnonzero((values != expected).reshape(len(values), -1).any(axis=1))
+        assert mismatch.size == 0, f"{name} differ from the baseline from index {mismatch[:1]}"
+
+
+def record():
+    arrays = {}
+    for version in VERSIONS:
+        for scenario, (_, num_episodes) in SCENARIOS.items():
+            for name, values in replay(make_env(version, scenario), num_episodes).items():
+                arrays[f"{version}/{scenario}/{name}"] = values
+    np.savez_compressed(BASELINE_PATH, **arrays)
+    print(f"Recorded {len(arrays)} arrays to {BASELINE_PATH}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', action='store_true', help='Record the baseline of the current envs')
+    args = parser.parse_args()
+    if args.record:
+        record()
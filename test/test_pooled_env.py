@@ -0,0 +1,75 @@
+import argparse
+import gc
+import tracemalloc
+
+import numpy as np
+
+from envs.arrivals import ReplayArrivals, UniformArrivals
+from envs.elevator_v7 import ElevatorV7Env
+
+"""
+Checks that ElevatorV7Env(pooled=True) reuses its state: over num_steps steps (with a reset every 101 steps), traced
+memory does not grow, the garbage collector never runs, and a step only allocates short-lived temporaries (the numpy
+temporaries of the action check, numpy scalars, ints and floats), at most MAX_STEP_TRANSIENT bytes, all freed before it
+returns. Run with pytest, or from the repository root with PYTHONPATH=. python test/test_pooled_env.py for a longer run.
+"""
+
+MAX_STEP_TRANSIENT = 2048
+
+
+def run(num_steps: int, num_floors: int, num_elevators: int):
+    # the same arrivals every episode, so that the state after every reset is the same
+    stream = UniformArrivals(0.3).sample(np.random.default_rng(0), num_floors, 101)
+    env = ElevatorV7Env(num_elevators_start=num_elevators, num_floors_start=num_floors, episode_len=100, pooled=True, arrivals=ReplayArrivals([stream]))
+    rng = np.random.default_rng(0)
+    actions = [rng.integers(env.action_space.nvec) for _ in range(1000)]
+    max_transient = 0
+
+    def episodes(n: int):
+        nonlocal max_transient
+        for _ in range(n):
+            done = False
+            while not done:
+                action = actions[env.t % len(actions)]
+                tracemalloc.reset_peak()
+                start, _ = tracemalloc.get_traced_memory()
+                _, _, done, _ = env.step(action)
+                _, peak = tracemalloc.get_traced_memory()
+                if not done:  # the last step of an episode copies the observation
+                    max_transient = max(max_transient, peak - start)
+            env.reset()
+
+    # warm up (first episodes, caches) with tracing on, so that what was allocated before is not counted as freed
+    tracemalloc.start()
+    env.reset()
+    episodes(100)
+    max_transient = 0
+
+    gc.collect()
+    collections_before = sum(stat["collections"] for stat in gc.get_stats())
+    before, _ = tracemalloc.get_traced_memory()
+
+    episodes(max(num_steps // (env.episode_len + 1), 1))
+
+    collections = sum(stat["collections"] for stat in gc.get_stats()) - collections_before
+    gc.collect()  # also empties the interpreter's free lists, as before the first measurement
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{num_steps} steps: traced memory {before} -> {after} bytes, at most {max_transient} bytes allocated during a step, {collections} gc collections")
+    assert after - before < 256, f"memory grew by {after - before} bytes"
+    assert max_transient <= MAX_STEP_TRANSIENT, f"a step allocated {max_transient} bytes"
+    assert collections == 0, f"{collections} gc collections"
+
+
+def test_pooled_step_does_not_allocate():
+    run(num_steps=5_000, num_floors=10, num_elevators=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_steps', '-t', default=1_000_000, help='Number of steps to measure')
+    parser.add_argument('--num_floors', '-n', default=10, help='Number of floors')
+    parser.add_argument('--num_elevators', '-e', default=2, help='Number of elevators')
+    args = parser.parse_args()
+    run(int(args.num_steps), int(args.num_floors), int(args.num_elevators))
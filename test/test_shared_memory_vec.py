@@ -0,0 +1,104 @@
+from functools import partial
+
+import numpy as np
+import pytest
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from envs.elevator_v7 import ElevatorV7Env
+from envs.shared_memory_vec import SharedMemoryVecEnv
+
+"""
+Checks SharedMemoryVecEnv against DummyVecEnv over the same envs and actions, and its error paths. Run with pytest
+from the repository root.
+"""
+
+NUM_ENVS = 4
+
+
+def make_env(seed: int):
+    return ElevatorV7Env(num_elevators_start=2, num_floors_start=5, episode_len=30, random_seed=seed)
+
+
+def env_fns():
+    return [partial(make_env, seed) for seed in range(NUM_ENVS)]
+
+
+@pytest.fixture
+def venvs():
+    shared = SharedMemoryVecEnv(env_fns(), num_workers=2)
+    dummy = DummyVecEnv(env_fns())
+    yield shared, dummy
+    shared.close()
+    dummy.close()
+
+
+def assert_same_step(shared_step, dummy_step):
+    (obs, rewards, dones, infos), (dummy_obs, dummy_rewards, dummy_dones, dummy_infos) = shared_step, dummy_step
+    assert np.array_equal(obs, dummy_obs)
+    assert np.array_equal(rewards, dummy_rewards)
+    assert np.array_equal(dones, dummy_dones)
+    for info, dummy_info in zip(infos, dummy_infos):
+        assert info.keys() == dummy_info.keys()
+        if "terminal_observation" in info:
+            assert np.array_equal(info["terminal_observation"], dummy_info["terminal_observation"])
+
+
+def step_both(shared, dummy, rng, num_steps: int):
+    for _ in range(num_steps):
+        actions = np.stack([rng.integers(shared.action_space.nvec) for _ in range(NUM_ENVS)])
+        assert_same_step(shared.step(actions), dummy.step(actions))
+
+
+def test_matches_dummy_vec_env(venvs):
+    shared, dummy = venvs
+    assert np.array_equal(shared.reset(), dummy.reset())
+    step_both(shared, dummy, np.random.default_rng(0), 100)  # several episodes, with terminal observations
+    assert shared.get_attr("num_dropped_off") == dummy.get_attr("num_dropped_off")
+
+
+def test_step_error_keeps_workers_in_step(venvs):
+    shared, dummy = venvs
+    shared.reset(), dummy.reset()
+    rng = np.random.default_rng(1)
+    step_both(shared, dummy, rng, 5)
+
+    # invalid action for the last env of the first worker: the second worker's envs still step, and its step must be
+    # collected before the error is raised (DummyVecEnv stops at the failing env, the other two are stepped by hand)
+    actions = np.stack([rng.integers(shared.action_space.nvec) for _ in range(NUM_ENVS)])
+    actions[1] = 99
+    with pytest.raises(RuntimeError, match="Invalid action"):
+        shared.step(actions)
+    with pytest.raises(AssertionError):
+        dummy.step(actions)
+    for env_idx in shared.worker_envs[1]:
+        dummy.envs[env_idx].step(actions[env_idx])
+
+    step_both(shared, dummy, rng, 40)
+
+
+def test_command_errors(venvs):
+    shared, _ = venvs
+    shared.reset()
+    with pytest.raises(RuntimeError, match="has no attribute 'missing'"):
+        shared.get_attr("missing")
+    with pytest.raises(RuntimeError, match="has no attribute 'missing'"):
+        shared.env_method("missing")
+    assert shared.get_attr("num_floors") == [5] * NUM_ENVS  # the workers are still there
+
+    # a command while a worker is stepping would replace its step
+    shared.step_async_worker(0, np.zeros((2, 2), dtype=np.int64))
+    with pytest.raises(RuntimeError, match="is stepping"):
+        shared.get_attr("num_floors", indices=0)
+    shared.step_wait_worker(0)
+    assert shared.get_attr("num_floors", indices=0) == [5]
+
+
+def test_dead_worker(venvs):
+    shared, _ = venvs
+    shared.reset()
+    shared.processes[1].kill()
+    shared.processes[1].join()
+    with pytest.raises(RuntimeError, match="worker 1 died"):
+        shared.get_attr("num_floors")
+    with pytest.raises(RuntimeError, match="worker 1 died"):
+        shared.step(np.zeros((NUM_ENVS, 2), dtype=np.int64))
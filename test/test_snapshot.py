@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from envs.elevator_v3 import ElevatorV3Env
+from envs.elevator_v7 import ElevatorV7Env
+
+"""
+Checks that restoring a snapshot of an env mid-episode replays the same trajectory. Run with pytest from the
+repository root.
+"""
+
+MODES = {"list": {}, "count_based": {"count_based": True}, "pooled": {"pooled": True}, "token": {"token_obs": True}}
+
+
+def as_array(obs) -> np.ndarray:
+    if isinstance(obs, dict):
+        return np.concatenate([np.ravel(value) for value in obs.values()])
+    return np.array(obs)
+
+
+def trajectory(env, actions) -> list:
+    steps = []
+    for action in actions:
+        obs, reward, done, _ = env.step(action)
+        steps.append((as_array(obs), reward, done))
+        if done:
+            steps.append((as_array(env.reset()), None, None))
+    return steps
+
+
+def assert_same_trajectory(steps, expected):
+    assert len(steps) == len(expected)
+    for (obs, reward, done), (expected_obs, expected_reward, expected_done) in zip(steps, expected):
+        assert np.array_equal(obs, expected_obs)
+        assert (reward, done) == (expected_reward, expected_done)
+
+
+@pytest.mark.parametrize("env_class", [ElevatorV3Env, ElevatorV7Env])
+@pytest.mark.parametrize("mode", MODES)
+def test_restore_replays_the_episode(env_class, mode):
+    env = env_class(num_elevators_start=2, num_floors_start=6, episode_len=40, request_prob=0.5, **MODES[mode])
+    rng = np.random.default_rng(0)
+    env.reset()
+    trajectory(env, [rng.integers(env.action_space.nvec) for _ in range(25)])
+
+    snapshot = env.snapshot()
+    actions = [rng.integers(env.action_space.nvec) for _ in range(60)]  # past the end of the episode
+    expected = trajectory(env, actions)
+    env.restore(snapshot)
+    assert_same_trajectory(trajectory(env, actions), expected)
+
+    # restoring into another env of the same configuration
+    other = env_class(num_elevators_start=2, num_floors_start=6, episode_len=40, request_prob=0.5, random_seed=1, **MODES[mode])
+    other.restore(snapshot)
+    assert_same_trajectory(trajectory(other, actions), expected)
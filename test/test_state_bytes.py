@@ -0,0 +1,62 @@
+import struct
+
+import numpy as np
+import pytest
+
+from envs.elevator_v7 import ElevatorV7Env
+from envs.snapshot import STATE_HEADER
+
+"""
+Checks the binary env state of to_bytes and from_bytes: exact round trips, and errors for states that do not fit the
+env. Run with pytest from the repository root.
+"""
+
+
+def make_env(**options):
+    return ElevatorV7Env(num_elevators_start=2, num_floors_start=6, episode_len=40, request_prob=0.5, **options)
+
+
+def run(env, actions) -> list:
+    steps = []
+    for action in actions:
+        obs, reward, done, _ = env.step(action)
+        steps.append((np.array(obs).tolist(), reward, done))
+        if done:
+            env.reset()
+    return steps
+
+
+@pytest.mark.parametrize("options", [{}, {"count_based": True}, {"pooled": True}])
+def test_bytes_round_trip(options):
+    env = make_env(**options)
+    rng = np.random.default_rng(0)
+    env.reset()
+    run(env, [rng.integers(env.action_space.nvec) for _ in range(25)])
+
+    data = env.to_bytes()
+    actions = [rng.integers(env.action_space.nvec) for _ in range(60)]
+    expected = run(env, actions)
+    other = make_env(random_seed=1, **options)
+    other.from_bytes(data)
+    assert other.to_bytes() == data
+    assert run(other, actions) == expected
+
+
+def test_from_bytes_errors():
+    data = make_env().to_bytes()
+
+    with pytest.raises(ValueError, match="count_based=False env, this env has count_based=True"):
+        make_env(count_based=True).from_bytes(data)
+    with pytest.raises(ValueError, match="does not fit"):
+        ElevatorV7Env(num_elevators_start=2, num_floors_start=4).from_bytes(data)
+    with pytest.raises(ValueError, match="does not fit"):
+        ElevatorV7Env(num_elevators_start=1, num_floors_start=6).from_bytes(data)
+
+    with pytest.raises(ValueError, match="not an elevator env state"):
+        make_env().from_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError, match="not an elevator env state"):
+        make_env().from_bytes(data[:10])
+    with pytest.raises(ValueError, match="unsupported state version"):
+        make_env().from_bytes(data[:4] + struct.pack("<H", 99) + data[6:])
+    with pytest.raises(ValueError):
+        make_env().from_bytes(data[: STATE_HEADER.size + 8])  # truncated arrays
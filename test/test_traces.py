@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from envs.elevator_v7 import ElevatorV7Env
+from envs.traces import Trace, TraceArrivals, TraceWriter
+
+"""
+Checks the edge cases of hall call traces. Run with pytest from the repository root.
+"""
+
+
+def test_empty_trace_has_no_arrivals(tmp_path):
+    path = str(tmp_path / "empty.bin")
+    with TraceWriter(path):
+        pass
+    assert len(Trace(path)) == 0
+
+    arrivals = TraceArrivals(path)
+    for _ in range(3):
+        assert len(arrivals.sample(np.random.default_rng(0), 5, 100)) == 0
+
+    env = ElevatorV7Env(num_elevators_start=2, num_floors_start=5, arrivals=arrivals)
+    env.reset()
+    for _ in range(20):
+        env.step(np.zeros(2, dtype=np.int64))
+    assert env.num_total_requests == 0
+
+
+@pytest.mark.parametrize("floor", [-1, 65536])
+def test_trace_rejects_floors_out_of_range(tmp_path, floor):
+    with TraceWriter(str(tmp_path / "trace.bin")) as writer:
+        with pytest.raises(ValueError, match="between 0 and 65535"):
+            writer.write([0, 1], [0, floor], [1, 0])
+        writer.write([0, 1], [0, 65535], [1, 0])
+
+
+def test_trace_rejects_columns_of_different_lengths(tmp_path):
+    with TraceWriter(str(tmp_path / "trace.bin")) as writer:
+        with pytest.raises(ValueError, match="same length"):
+            writer.write([0, 1, 2], [1, 2], [3])
+        writer.write([0, 1], [1, 2], [3, 0])
+    trace = Trace(str(tmp_path / "trace.bin"))
+    assert len(trace) == 2 and trace.num_floors == 4
+
+
+def test_failed_conversion_leaves_no_trace(tmp_path):
+    path = tmp_path / "trace.bin"
+    with pytest.raises(ValueError):
+        with TraceWriter(str(path)) as writer:
+            writer.write([0, 1], [1, 2], [3, 0])
+            writer.write([0], [1], [2])  # before the last tick
+    assert list(tmp_path.iterdir()) == []
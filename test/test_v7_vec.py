@@ -0,0 +1,47 @@
+from functools import partial
+
+import numpy as np
+import pytest
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from envs.arrivals import PoissonArrivals
+from envs.elevator_v7 import ElevatorV7Env
+from envs.elevator_v7_vec import ElevatorV7VecEnv
+
+"""
+Checks that ElevatorV7VecEnv steps its buildings as ElevatorV7Env does: the same observations, rewards, dones and
+terminal observations as DummyVecEnv over ElevatorV7Env(random_seed=seed + i), for the same actions. Run with pytest
+from the repository root.
+"""
+
+SCENARIOS = {
+    "fixed": (4, dict(num_elevators_start=2, num_floors_start=6, episode_len=30, request_prob=0.4)),
+    "poisson": (4, dict(num_elevators_start=2, num_floors_start=6, episode_len=30, arrivals=PoissonArrivals(0.1))),
+    # one building: with several, the vec env's buildings share one curriculum and the single envs have their own
+    "curriculum": (1, dict(num_elevators_start=1, num_floors_start=3, curriculum=True, num_elevators_end=2, num_floors_end=5, episode_len=10, request_prob=0.05)),
+}
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_vec_env_matches_single_envs(scenario):
+    num_envs, kwargs = SCENARIOS[scenario]
+    vec_env = ElevatorV7VecEnv(num_envs=num_envs, random_seed=7, **kwargs)
+    dummy = DummyVecEnv([partial(ElevatorV7Env, random_seed=7 + i, **kwargs) for i in range(num_envs)])
+    rng = np.random.default_rng(0)
+
+    assert np.array_equal(vec_env.reset(), dummy.reset())
+    for _ in range(40 * (kwargs["episode_len"] + 1)):
+        actions = np.stack([rng.integers(vec_env.action_space.nvec) for _ in range(num_envs)])
+        obs, rewards, dones, infos = vec_env.step(actions)
+        dummy_obs, dummy_rewards, dummy_dones, dummy_infos = dummy.step(actions)
+        assert np.array_equal(obs, dummy_obs)
+        assert np.array_equal(rewards, dummy_rewards)
+        assert np.array_equal(dones, dummy_dones)
+        for info, dummy_info in zip(infos, dummy_infos):
+            assert info.keys() == dummy_info.keys()
+            if "terminal_observation" in info:
+                assert np.array_equal(info["terminal_observation"], dummy_info["terminal_observation"])
+
+    if kwargs.get("curriculum"):
+        assert vec_env.num_floors > kwargs["num_floors_start"], "the curriculum never advanced"
+        assert (vec_env.num_elevators, vec_env.num_floors) == (dummy.envs[0].num_elevators, dummy.envs[0].num_floors)
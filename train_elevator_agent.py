@@ -1,6 +1,13 @@
 from envs.elevator_v7 import ElevatorV7Env
+from envs.elevator_v7_vec import ElevatorV7VecEnv
+from envs.frame_history import FrameHistoryWrapper, VecFrameHistory
+from envs.shared_memory_vec import SharedMemoryVecEnv
+from functools import partial
 from stable_baselines3 import A2C, PPO
 from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import VecEnv
+from training.buffers import CompactPPO
+from training.policies import TokenPolicy
 import secrets
 import torch
 import numpy as np
@@ -8,18 +15,32 @@ import random
 import argparse
 
 
+def env_attr(env, name: str):
+    """Attribute of the training env; for a VecEnv of separate envs (SharedMemoryVecEnv), the first env's"""
+    if isinstance(env, VecEnv):
+        return env.get_attr(name, indices=0)[0]
+    return getattr(env, name)
+
+
 class TensorboardCallback(BaseCallback):
     def __init__(self, caller_env, verbose=0):
         super(TensorboardCallback, self).__init__(verbose)
         self.env = caller_env
 
     def _on_step(self) -> bool:
-        self.logger.record("env/num_floors", self.env.num_floors)
-        self.logger.record("env/num_elevators", self.env.num_elevators)
-        if sum(self.env.requests_history) > 0:
-            self.logger.record("env/drop_history", sum(self.env.dropped_off_history) / sum(self.env.requests_history))
         return True
 
+    def _on_rollout_end(self):
+        # the logger keeps the last value recorded before it is dumped, which happens after the rollout
+        requests_history = env_attr(self.env, "requests_history")
+        self.logger.record("env/num_floors", env_attr(self.env, "num_floors"))
+        self.logger.record("env/num_elevators", env_attr(self.env, "num_elevators"))
+        if sum(requests_history) > 0:
+            self.logger.record("env/drop_history", sum(env_attr(self.env, "dropped_off_history")) / sum(requests_history))
+        profiler = env_attr(self.env, "profiler")
+        if profiler is not None:
+            profiler.record(self.logger)
+
 
 def main(args):
     num_elevators_start = 1
@@ -29,6 +50,23 @@ def main(args):
 
     total_timesteps = int(args.timesteps)
     verbose = int(args.verbose)
+    num_envs = int(args.num_envs)
+    compact_obs = bool(int(args.compact_obs))
+    token_obs = bool(int(args.token_obs))
+    if token_obs and num_envs > 1:
+        raise ValueError("token observations are not supported by the batched env, use --num_envs 1")
+    maskable = bool(int(args.maskable))
+    if maskable and token_obs:
+        raise ValueError("TokenPolicy already masks the floors past the current size, --maskable is for the MlpPolicy")
+    if maskable and compact_obs:
+        raise ValueError("MaskablePPO stores observations in its own (int64/float32) rollout buffer, not CompactPPO's uint8 one: use --maskable or --compact_obs")
+    profile = bool(int(args.profile))
+    num_workers = int(args.num_workers)
+    if num_workers > 0 and token_obs:
+        raise ValueError("token observations are Dicts, the worker processes only share array observations")
+    history = int(args.history)
+    if history > 1 and token_obs:
+        raise ValueError("token observations are Dicts, the frame history stacks observation vectors")
 
     # generate model identifier before resetting seeds
     model_identifier = secrets.token_hex(3)
@@ -44,25 +82,88 @@ def main(args):
 
     tensorboard_dir = f"./tensorboard/{env_identifier}/{model_identifier}/"
 
-    env = ElevatorV7Env(curriculum=True,
-                        num_elevators_start=num_elevators_start,
-                        num_elevators_end=num_elevators_end,
-                        num_floors_start=num_floors_start,
-                        num_floors_end=num_floors_end,
-                        episode_len=100,
-                        random_seed=random_seed)
-
-    model = PPO("MlpPolicy", env, verbose=verbose, tensorboard_log=tensorboard_dir)
+    if num_workers > 0:
+        # one ElevatorV7Env (with its own curriculum) per building, stepped in worker processes
+        env = SharedMemoryVecEnv([partial(ElevatorV7Env,
+                                          curriculum=True,
+                                          num_elevators_start=num_elevators_start,
+                                          num_elevators_end=num_elevators_end,
+                                          num_floors_start=num_floors_start,
+                                          num_floors_end=num_floors_end,
+                                          episode_len=100,
+                                          random_seed=random_seed + i,
+                                          compact_obs=compact_obs,
+                                          profile=profile) for i in range(num_envs)],
+                                 num_workers=num_workers)
+    elif num_envs > 1:
+        # all buildings are stepped together by the batched engine
+        env = ElevatorV7VecEnv(num_envs=num_envs,
+                               curriculum=True,
+                               num_elevators_start=num_elevators_start,
+                               num_elevators_end=num_elevators_end,
+                               num_floors_start=num_floors_start,
+                               num_floors_end=num_floors_end,
+                               episode_len=100,
+                               random_seed=random_seed,
+                               compact_obs=compact_obs,
+                               profile=profile)
+    else:
+        env = ElevatorV7Env(curriculum=True,
+                            num_elevators_start=num_elevators_start,
+                            num_elevators_end=num_elevators_end,
+                            num_floors_start=num_floors_start,
+                            num_floors_end=num_floors_end,
+                            episode_len=100,
+                            random_seed=random_seed,
+                            compact_obs=compact_obs,
+                            token_obs=token_obs,
+                            profile=profile)
+
+    if history > 1:
+        # observations of the last `history` timesteps, flattened into one vector
+        env = VecFrameHistory(env, history) if isinstance(env, VecEnv) else FrameHistoryWrapper(env, history)
+
+    # compact observations are kept in their dtype (uint8) in the rollout buffer too (token observations are float32)
+    model_class = CompactPPO if compact_obs and not token_obs else PPO
+    if maskable:
+        # sample only the floors of the current curriculum stage (env.action_masks), needs sb3_contrib
+        from sb3_contrib import MaskablePPO
+        model_class = MaskablePPO
+    # token observations: a policy whose weights do not depend on the building size
+    model = model_class(TokenPolicy if token_obs else "MlpPolicy", env, verbose=verbose, tensorboard_log=tensorboard_dir)
     model.learn(total_timesteps=total_timesteps, callback=TensorboardCallback(env))
     model.save(f"./models/{env_identifier}/{model_identifier}")
+    if profile:
+        # time per env phase during training, also in TensorBoard under profile/
+        profiler = env_attr(env, "profiler")
+        print(profiler)
+        profiler.save(f"./models/{env_identifier}/{model_identifier}_profile.json")
 
     # test the trained model for 2000 timesteps
     # for full testing, see benchmark_agents.py
 
+    if num_envs > 1 or num_workers > 0:
+        # test on a single env at the curriculum stage reached during training
+        num_elevators, num_floors = env_attr(env, "num_elevators"), env_attr(env, "num_floors")
+        if num_workers > 0:
+            env.close()
+        env = ElevatorV7Env(curriculum=True,
+                            num_elevators_start=num_elevators,
+                            num_elevators_end=num_elevators_end,
+                            num_floors_start=num_floors,
+                            num_floors_end=num_floors_end,
+                            episode_len=100,
+                            random_seed=random_seed)
+        if history > 1:
+            env = FrameHistoryWrapper(env, history)
+
     obs = env.reset(override_curriculum=True)
     total_reward = 0
     for i in range(2000):
-        action, _ = model.predict(obs, deterministic=True)
+        if maskable:
+            action, _ = model.predict(obs, deterministic=True, action_masks=env.action_masks())
+        else:
+            action, _ = model.predict(obs, deterministic=True)
         obs, reward, done, _ = env.step(action)
         total_reward += reward
         if done:
@@ -80,6 +181,13 @@ if __name__ == '__main__':
     parser.add_argument('--timesteps', '-t', default=100_000, help='Number of timesteps to train')
     parser.add_argument('--seed', '-s', default=0, help='Random seed to use')
     parser.add_argument('--verbose', '-v', default=0, help='Verbosity (0 or 1)')
+    parser.add_argument('--num_envs', '-n', default=1, help='Number of buildings to simulate in parallel (uses the batched env when > 1)')
+    parser.add_argument('--compact_obs', '-c', default=0, help='Store observations as uint8 instead of int64 (0 or 1)')
+    parser.add_argument('--maskable', '-m', default=0, help='Train with MaskablePPO (sb3_contrib), masking the floors past the current curriculum stage (0 or 1)')
+    parser.add_argument('--token_obs', '-k', default=0, help='Train on per-elevator and per-floor tokens with a size-independent policy (0 or 1)')
+    parser.add_argument('--history', '-H', default=1, help='Number of timesteps of observations the policy sees, stacked by a ring buffer (1: the current one)')
+    parser.add_argument('--num_workers', '-w', default=0, help='Step num_envs separate envs in this many worker processes sharing memory (0: in this process)')
+    parser.add_argument('--profile', '-p', default=0, help='Time the phases of the env steps, logged to TensorBoard and saved as JSON next to the model (0 or 1)')
 
     args = parser.parse_args()
     main(args)
@@ -0,0 +1,61 @@
+import numpy as np
+import torch as th
+from gym import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.buffers import BaseBuffer, RolloutBuffer
+
+
+class CompactRolloutBuffer(RolloutBuffer):
+    """
+    RolloutBuffer that keeps observations in the observation space's dtype (e.g. uint8 with compact_obs=True) instead
+    of float32, and copies them into the buffer once per step. Minibatches are sampled as tensors of that dtype, which
+    the policies' MultiDiscrete preprocessing (one-hot) accepts as is.
+    """
+
+    def reset(self) -> None:
+        # RolloutBuffer.reset, without allocating a float32 observation array first
+        self.observations = np.zeros((self.buffer_size, self.n_envs, *self.obs_shape), dtype=self.observation_space.dtype)
+        self.actions = np.zeros((self.buffer_size, self.n_envs, self.action_dim), dtype=np.float32)
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.returns = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.episode_starts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.values = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.log_probs = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.advantages = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.generator_ready = False
+        BaseBuffer.reset(self)
+
+    def add(self, obs: np.ndarray, action: np.ndarray, reward: np.ndarray, episode_start: np.ndarray, value: th.Tensor, log_prob: th.Tensor) -> None:
+        if len(log_prob.shape) == 0:
+            # Reshape 0-d tensor to avoid error
+            log_prob = log_prob.reshape(-1, 1)
+
+        if isinstance(self.observation_space, spaces.Discrete):
+            obs = obs.reshape((self.n_envs, *self.obs_shape))
+        action = action.reshape((self.n_envs, self.action_dim))
+
+        self.observations[self.pos] = obs
+        self.actions[self.pos] = action
+        self.rewards[self.pos] = reward
+        self.episode_starts[self.pos] = episode_start
+        self.values[self.pos] = value.clone().cpu().numpy().flatten()
+        self.log_probs[self.pos] = log_prob.clone().cpu().numpy()
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+
+
+class CompactPPO(PPO):
+    """PPO collecting its rollouts in a CompactRolloutBuffer (saved models load with PPO.load too)"""
+
+    def _setup_model(self) -> None:
+        super()._setup_model()
+        self.rollout_buffer = CompactRolloutBuffer(
+            self.n_steps,
+            self.observation_space,
+            self.action_space,
+            device=self.device,
+            gamma=self.gamma,
+            gae_lambda=self.gae_lambda,
+            n_envs=self.n_envs,
+        )
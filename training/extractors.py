@@ -0,0 +1,76 @@
+import gym
+import torch as th
+from torch import nn
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+
+class UnpackingExtractor(BaseFeaturesExtractor):
+    """
+    Features extractor for packed observations (packed_obs=True): unpacks the button bits and one-hot encodes every
+    unpacked slot, so the policy network gets exactly the input it would get from the unpacked MultiDiscrete
+    observation. Pass the env's encoder.unpack_spec as features_extractor_kwargs.
+    """
+
+    def __init__(self, observation_space: gym.spaces.Box, unpacked_byte: list[int], unpacked_bit: list[int], unpacked_nvec: list[int]):
+        super().__init__(observation_space, features_dim=sum(unpacked_nvec))
+        bit = th.as_tensor(unpacked_bit, dtype=th.long)
+        self.register_buffer("unpacked_byte", th.as_tensor(unpacked_byte, dtype=th.long), persistent=False)
+        self.register_buffer("shift", bit.clamp(min=0), persistent=False)
+        self.register_buffer("mask", th.where(bit < 0, 0xFF, 1), persistent=False)
+        # position of each unpacked slot's one-hot block in the features
+        offsets = th.cumsum(th.as_tensor([0] + unpacked_nvec[:-1], dtype=th.long), dim=0)
+        self.register_buffer("offsets", offsets, persistent=False)
+
+    def forward(self, observations: th.Tensor) -> th.Tensor:
+        values = (observations.long()[:, self.unpacked_byte] >> self.shift) & self.mask
+        features = th.zeros(observations.shape[0], self.features_dim, device=observations.device)
+        return features.scatter_(1, values + self.offsets, 1.0)
+
+
+def masked_mean(tokens: th.Tensor, mask: th.Tensor) -> th.Tensor:
+    """Mean of the tokens (batch, n, dim) where mask (batch, n) is 1"""
+    return (tokens * mask.unsqueeze(-1)).sum(1) / mask.sum(1, keepdim=True).clamp(min=1)
+
+
+class TokenExtractor(BaseFeaturesExtractor):
+    """
+    Permutation-equivariant features extractor for token observations (token_obs=True). Every elevator and every floor
+    token goes through an MLP shared by all the tokens of its kind, then through a second shared layer that also sees
+    the mean elevator and floor embeddings and, for an elevator, the mean embedding of the floors pressed in it. No
+    weight depends on the number of floors or elevators, and the tokens past the largest current size of the batch are
+    not computed, so the cost follows the actual building size.
+
+    forward returns the pooled elevator and floor embeddings; tokens returns the per-token embeddings (see TokenPolicy).
+    """
+
+    def __init__(self, observation_space: gym.spaces.Dict, hidden_dim: int = 64):
+        super().__init__(observation_space, features_dim=2 * hidden_dim)
+        self.hidden_dim = hidden_dim
+        car_dim = observation_space["cars"].shape[-1]
+        floor_dim = observation_space["floors"].shape[-1]
+        self.car_net = nn.Sequential(nn.Linear(car_dim, hidden_dim), nn.ReLU(), nn.Linear(hidden_dim, hidden_dim), nn.ReLU())
+        self.floor_net = nn.Sequential(nn.Linear(floor_dim, hidden_dim), nn.ReLU(), nn.Linear(hidden_dim, hidden_dim), nn.ReLU())
+        self.car_mix = nn.Sequential(nn.Linear(4 * hidden_dim, hidden_dim), nn.ReLU())
+        self.floor_mix = nn.Sequential(nn.Linear(3 * hidden_dim, hidden_dim), nn.ReLU())
+
+    def tokens(self, observations: dict[str, th.Tensor]) -> tuple[th.Tensor, th.Tensor, th.Tensor, th.Tensor]:
+        """Elevator embeddings (batch, cars, dim), floor embeddings (batch, floors, dim) and their masks, cut to the largest current sizes"""
+        num_cars = max(int(observations["car_mask"].sum(1).max()), 1)
+        num_floors = max(int(observations["floor_mask"].sum(1).max()), 1)
+        car_mask = observations["car_mask"][:, :num_cars]
+        floor_mask = observations["floor_mask"][:, :num_floors]
+        buttons = observations["car_buttons"][:, :num_cars, :num_floors]
+
+        cars = self.car_net(observations["cars"][:, :num_cars])
+        floors = self.floor_net(observations["floors"][:, :num_floors])
+        car_mean = masked_mean(cars, car_mask).unsqueeze(1)
+        floor_mean = masked_mean(floors, floor_mask).unsqueeze(1)
+        pressed = th.bmm(buttons, floors) / buttons.sum(-1, keepdim=True).clamp(min=1)
+
+        cars = self.car_mix(th.cat([cars, pressed, car_mean.expand_as(cars), floor_mean.expand_as(cars)], dim=-1))
+        floors = self.floor_mix(th.cat([floors, car_mean.expand_as(floors), floor_mean.expand_as(floors)], dim=-1))
+        return cars, floors, car_mask, floor_mask
+
+    def forward(self, observations: dict[str, th.Tensor]) -> th.Tensor:
+        cars, floors, car_mask, floor_mask = self.tokens(observations)
+        return th.cat([masked_mean(cars, car_mask), masked_mean(floors, floor_mask)], dim=1)
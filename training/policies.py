@@ -0,0 +1,73 @@
+import torch as th
+from torch import nn
+from stable_baselines3.common.distributions import Distribution
+from stable_baselines3.common.policies import ActorCriticPolicy
+from stable_baselines3.common.preprocessing import preprocess_obs
+
+from training.extractors import TokenExtractor, masked_mean
+
+# logit of the actions that cannot be taken (floors and elevators past the current sizes)
+MASKED_LOGIT = -1e8
+
+
+class TokenPolicy(ActorCriticPolicy):
+    """
+    Actor-critic for token observations (token_obs=True) whose weights do not depend on the number of floors or
+    elevators. The logit of target floor f for elevator c is a shared MLP of their TokenExtractor embeddings, whether
+    f is pressed in c and the height difference; the value is an MLP of the pooled embeddings.
+
+    A trained model therefore runs in any building size. Load it with the spaces of the env to run it in:
+        PPO.load(path, custom_objects={"observation_space": env.observation_space, "action_space": env.action_space})
+    """
+
+    def __init__(self, observation_space, action_space, lr_schedule, hidden_dim: int = 64, **kwargs):
+        kwargs.setdefault("features_extractor_class", TokenExtractor)
+        kwargs.setdefault("features_extractor_kwargs", {"hidden_dim": hidden_dim})
+        super().__init__(observation_space, action_space, lr_schedule, **kwargs)
+
+    def _build(self, lr_schedule) -> None:
+        hidden_dim = self.features_extractor.hidden_dim
+        self.pair_net = nn.Sequential(nn.Linear(2 * hidden_dim + 2, hidden_dim), nn.ReLU(), nn.Linear(hidden_dim, 1))
+        self.value_net = nn.Sequential(nn.Linear(2 * hidden_dim, hidden_dim), nn.ReLU(), nn.Linear(hidden_dim, 1))
+        self.optimizer = self.optimizer_class(self.parameters(), lr=lr_schedule(1), **self.optimizer_kwargs)
+
+    def _distribution_and_values(self, obs) -> tuple[Distribution, th.Tensor]:
+        obs = preprocess_obs(obs, self.observation_space, normalize_images=self.normalize_images)
+        cars, floors, car_mask, floor_mask = self.features_extractor.tokens(obs)
+        batch_size, num_cars, num_floors = cars.shape[0], cars.shape[1], floors.shape[1]
+
+        buttons = obs["car_buttons"][:, :num_cars, :num_floors]
+        heights = obs["floors"][:, :num_floors, 2].unsqueeze(1) - obs["cars"][:, :num_cars, 0].unsqueeze(2)
+        pairs = th.cat([
+            cars.unsqueeze(2).expand(-1, -1, num_floors, -1),
+            floors.unsqueeze(1).expand(-1, num_cars, -1, -1),
+            buttons.unsqueeze(-1),
+            heights.unsqueeze(-1),
+        ], dim=-1)
+        pair_logits = self.pair_net(pairs).squeeze(-1).masked_fill(floor_mask.unsqueeze(1) == 0, MASKED_LOGIT)
+
+        # pad to the action space: floor 0 is the only possible action of the elevators that do not exist
+        max_cars, max_floors = len(self.action_space.nvec), int(self.action_space.nvec[0])
+        logits = th.full((batch_size, max_cars, max_floors), MASKED_LOGIT, device=cars.device)
+        logits[:, :, 0] = 0
+        logits[:, :num_cars, :num_floors] = th.where(car_mask.unsqueeze(-1) > 0, pair_logits, logits[:, :num_cars, :num_floors])
+
+        distribution = self.action_dist.proba_distribution(action_logits=logits.reshape(batch_size, -1))
+        values = self.value_net(th.cat([masked_mean(cars, car_mask), masked_mean(floors, floor_mask)], dim=1))
+        return distribution, values
+
+    def forward(self, obs, deterministic: bool = False) -> tuple[th.Tensor, th.Tensor, th.Tensor]:
+        distribution, values = self._distribution_and_values(obs)
+        actions = distribution.get_actions(deterministic=deterministic)
+        log_prob = distribution.log_prob(actions)
+        return actions.reshape((-1, *self.action_space.shape)), values, log_prob
+
+    def evaluate_actions(self, obs, actions: th.Tensor) -> tuple[th.Tensor, th.Tensor, th.Tensor]:
+        distribution, values = self._distribution_and_values(obs)
+        return values, distribution.log_prob(actions), distribution.entropy()
+
+    def get_distribution(self, obs) -> Distribution:
+        return self._distribution_and_values(obs)[0]
+
+    def predict_values(self, obs) -> th.Tensor:
+        return self._distribution_and_values(obs)[1]
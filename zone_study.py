@@ -0,0 +1,37 @@
+import argparse
+import time
+
+from agents.standard_elevator_v7_controller import StandardElevatorV7Controller
+from envs.arrivals import PoissonArrivals
+from envs.elevator_zones import ZonedElevatorSim
+
+
+def main(args):
+    sim = ZonedElevatorSim.skyscraper(int(args.num_floors), int(args.num_elevators), int(args.num_zones), StandardElevatorV7Controller,
+                                      arrivals=PoissonArrivals(float(args.floor_rate)),
+                                      episode_len=int(args.episode_len),
+                                      random_seed=int(args.seed),
+                                      processes=not args.single_process)
+
+    start = time.time()
+    episodes = [sim.run() for _ in range(int(args.episodes))]
+    elapsed = time.time() - start
+    sim.close()
+
+    print(f"Simulated {args.episodes} episodes of {sim.num_elevators} elevators, {sim.num_floors} floors in {sim.num_zones} zones in {elapsed:.1f}s")
+    for name in episodes[0]:
+        print(f"    {name}: {sum(stats[name] for stats in episodes) / len(episodes):.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_floors', '-n', default=120, help='Number of floors')
+    parser.add_argument('--num_elevators', '-e', default=24, help='Number of elevators')
+    parser.add_argument('--num_zones', '-z', default=3, help='Number of zones (banks of elevators), each serving the lobby and consecutive floors')
+    parser.add_argument('--floor_rate', '-r', default=0.005, help='Expected requests per floor per timestep')
+    parser.add_argument('--episodes', default=10, help='Number of episodes to simulate')
+    parser.add_argument('--episode_len', '-l', default=1000, help='Number of timesteps per episode')
+    parser.add_argument('--single_process', action='store_true', help='Run the zones one after another in this process')
+    parser.add_argument('--seed', '-s', default=0, help='Random seed to use')
+    args = parser.parse_args()
+    main(args)